@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Check a single translation unit, or the translation units of a target, from the build system.
+
+This script will:
+1) Optionally write a depfile listing the headers of the translation units,
+   generated by the compiler from the compilation database `compile_commands.json`.
+2) Run `clang-format` or `clang-tidy` on the file, or PCLint on the translation units of a target.
+3) Touch a stamp file when the check passes, so that the build system runs it again only when an input changes.
+"""
+
+import json
+import logging
+import os
+import re
+import shlex
+import shutil
+import subprocess
+
+import click
+
+from check.checks import (
+    PCLINT_DEFAULT_CONFIG_FILE_PATH,
+    TOOL_CLANG_FORMAT,
+    TOOL_CLANG_TIDY,
+    TOOL_PCLINT,
+    check_format,
+    check_pclint,
+    check_tidy,
+    clang_format_args,
+)
+from common.shard import COMPILE_COMMANDS_FILE_NAME
+from pclint.run_pclint import (
+    PCLINT_CONFIG_SCRIPT_RELATIVE_PATH,
+    PCLINT_LINTER_EXECUTABLE,
+    PCLINT_OUTPUT_PATH,
+    RunPCLint,
+)
+
+# CONSTANTS
+
+# Compiler options not compatible with the generation of dependencies only
+COMPILER_OPTIONS_WITH_VALUE_TO_DROP = ["-o", "-MF", "-MT", "-MQ"]
+COMPILER_OPTIONS_TO_DROP = ["-c", "-MD", "-MMD", "-M", "-MM", "-MP"]
+
+# Matches the target of a make rule, the first colon followed by a blank (not a drive letter)
+DEPFILE_TARGET_REGEX = re.compile(r"^(?P<target>.*?):(?=\s)")
+
+
+def find_compile_commands(build_path: os.PathLike, files: list[os.PathLike]) -> list[dict]:
+    """
+    Finds the compilation database entries of some files.
+
+    :param build_path: Path to the folder containing the compilation database.
+    :param files: The files to look for.
+    :return: The compilation database entries, in the order of the files.
+    """
+    with open(os.path.join(build_path, COMPILE_COMMANDS_FILE_NAME), "r") as compile_command_file:
+        compile_command_data = json.load(compile_command_file)
+
+    items = {os.path.normpath(os.path.join(item["directory"], item["file"])): item for item in compile_command_data}
+    compile_commands = []
+    for file in files:
+        file = os.path.normpath(os.path.abspath(file))
+        if file not in items:
+            raise click.ClickException(f"{file} not found in the compilation database of {build_path}")
+        compile_commands.append(items[file])
+    return compile_commands
+
+
+def build_depfile_command(compile_command: dict, depfile: os.PathLike, stamp: os.PathLike) -> list[str]:
+    """
+    Turns a compilation command in a command generating the dependencies of the translation unit.
+
+    :param compile_command: The compilation database entry.
+    :param depfile: Path to the depfile to generate.
+    :param stamp: The depfile target.
+    :return: The command.
+    """
+    if "arguments" in compile_command:
+        arguments = list(compile_command["arguments"])
+    else:
+        arguments = shlex.split(compile_command["command"])
+
+    cmd = []
+    skip_next = False
+    for argument in arguments:
+        if skip_next:
+            skip_next = False
+        elif argument in COMPILER_OPTIONS_WITH_VALUE_TO_DROP:
+            skip_next = True
+        elif argument in COMPILER_OPTIONS_TO_DROP or argument.startswith(tuple(COMPILER_OPTIONS_WITH_VALUE_TO_DROP)):
+            continue
+        else:
+            cmd.append(argument)
+
+    return [*cmd, "-MM", "-MF", depfile, "-MT", stamp]
+
+
+def write_depfile(compile_commands: list[dict], depfile: os.PathLike, stamp: os.PathLike) -> None:
+    """
+    Writes a depfile with the dependencies of all the translation units, as a single rule.
+
+    :param compile_commands: The compilation database entries.
+    :param depfile: Path to the depfile to generate.
+    :param stamp: The depfile target.
+    """
+    os.makedirs(os.path.dirname(depfile), exist_ok=True)
+    target = None
+    dependencies = []
+    for compile_command in compile_commands:
+        cmd = build_depfile_command(compile_command, depfile, stamp)
+        logging.debug("invoking: %s", subprocess.list2cmdline(cmd))
+        subprocess.run(cmd, cwd=compile_command["directory"], check=True)
+
+        with open(depfile, "r") as depfile_file:
+            rule = depfile_file.read()
+        match = DEPFILE_TARGET_REGEX.match(rule)
+        target = match["target"]
+        dependencies.append(rule[match.end() :].strip())
+
+    if len(compile_commands) > 1:
+        with open(depfile, "w") as depfile_file:
+            depfile_file.write(f"{target}: " + " \\\n  ".join(dependencies) + "\n")
+
+
+@click.command()
+@click.option(
+    "--log-level",
+    "-l",
+    type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], case_sensitive=False),
+    default="INFO",
+    help="Set the logging level",
+)
+@click.option(
+    "--build-path",
+    required=True,
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, resolve_path=True),
+    help="Path to a folder containg a compile command database",
+)
+@click.option(
+    "--tool",
+    required=True,
+    type=click.Choice([TOOL_CLANG_FORMAT, TOOL_CLANG_TIDY, TOOL_PCLINT]),
+    help="Tool to run",
+)
+@click.option(
+    "--stamp",
+    required=True,
+    type=click.Path(dir_okay=False, resolve_path=True),
+    help="Stamp file touched when the check passes",
+)
+@click.option(
+    "--depfile",
+    type=click.Path(dir_okay=False, resolve_path=True),
+    help="Depfile to generate from the compilation database",
+)
+@click.option(
+    "--clang-format-executable",
+    default="clang-format",
+    help="Path to the clang-format executable",
+)
+@click.option(
+    "--clang-tidy-executable",
+    default="clang-tidy",
+    help="Path to the clang-tidy executable",
+)
+@click.option(
+    "--pclint-path",
+    type=click.Path(file_okay=False, dir_okay=True, resolve_path=True),
+    default=os.path.dirname(shutil.which(PCLINT_LINTER_EXECUTABLE) or ""),
+    help="Path to PCLint binary directory.",
+)
+@click.option(
+    "--pclint-config",
+    type=click.Path(exists=True, dir_okay=False, resolve_path=True),
+    default=PCLINT_DEFAULT_CONFIG_FILE_PATH,
+    help="PCLint main configuration file",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Kill the check when running longer than the given time (in seconds)",
+)
+@click.argument("files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False, resolve_path=True))
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    log_level: str,
+    build_path: os.PathLike,
+    tool: str,
+    stamp: os.PathLike,
+    depfile: os.PathLike | None,
+    clang_format_executable: str,
+    clang_tidy_executable: str,
+    pclint_path: os.PathLike,
+    pclint_config: os.PathLike,
+    timeout: float | None,
+    files: tuple[os.PathLike],
+):
+    """
+    Check a single file (clang-format, clang-tidy) or the translation units of a target (PCLint),
+    to be invoked by the build system.
+    """
+    # setup logging
+    logging.basicConfig(level=getattr(logging, log_level))
+
+    if tool != TOOL_PCLINT and len(files) != 1:
+        raise click.UsageError(f"{tool} checks a single file")
+
+    # a failing check must run again on the next build
+    if os.path.exists(stamp):
+        os.remove(stamp)
+
+    if depfile:
+        write_depfile(find_compile_commands(build_path, files), depfile, stamp)
+
+    if tool == TOOL_CLANG_FORMAT:
+        result = check_format(clang_format_args(clang_format_executable, timeout), files[0])
+    elif tool == TOOL_CLANG_TIDY:
+        result = check_tidy(clang_tidy_executable, build_path, files[0], timeout)
+    else:
+        # Find path for PCLint config script
+        pcpl_config_path = os.path.abspath(os.path.join(pclint_path, PCLINT_CONFIG_SCRIPT_RELATIVE_PATH))
+        if not os.path.isfile(pcpl_config_path):
+            raise click.UsageError(f"Could not find pcpl_config.py in '{pclint_path}', use --pclint-path")
+
+        # the configuration of each target is generated next to its stamp, the targets are linted in parallel
+        pclint_output_path = os.path.join(os.path.dirname(stamp), PCLINT_OUTPUT_PATH)
+        os.makedirs(pclint_output_path, exist_ok=True)
+
+        pclint = RunPCLint(
+            pclint_output_path, pcpl_config_path, build_path, pclint_path, timeout=timeout, sources=files
+        )
+        result = check_pclint(pclint, [pclint_config])
+
+    click.echo(result.errors, err=True, nl=False)
+    click.echo(result.output, nl=False)
+    ret_val = result.returncode
+    if ret_val == 0:
+        os.makedirs(os.path.dirname(stamp), exist_ok=True)
+        with open(stamp, "w"):
+            pass
+    ctx.exit(ret_val)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,120 @@
+"""
+Single file checks shared by `embstract-check` and `embstract-check-tu`.
+"""
+
+import argparse
+import logging
+import os
+import subprocess
+from dataclasses import dataclass
+
+from clang_format.run_clang_format import DiffError, TimeoutDiffError, run_clang_format_diff
+from common import process
+from pclint.run_pclint import RunPCLint
+
+# CONSTANTS
+
+TOOL_CLANG_FORMAT = "clang-format"
+TOOL_CLANG_TIDY = "clang-tidy"
+TOOL_PCLINT = "pclint"
+TOOLS = [TOOL_CLANG_FORMAT, TOOL_CLANG_TIDY, TOOL_PCLINT]
+
+PCLINT_DEFAULT_CONFIG_FILE_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pclint", "config", "std.lnt"
+)
+
+
+@dataclass
+class CheckResult:
+    """
+    The outcome of a single tool invocation.
+    """
+
+    tool: str
+    target: str
+    returncode: int
+    output: str = ""
+    errors: str = ""
+    duration: float = 0.0
+    timed_out: bool = False
+
+
+def clang_format_args(
+    clang_format_executable: str, timeout: float | None, retry_timeouts: bool = False
+) -> argparse.Namespace:
+    """
+    Builds the `run-clang-format` options used by `check_format`.
+
+    :param clang_format_executable: Path to the clang-format executable.
+    :param timeout: Time budget of a clang-format process in seconds, no limit if None.
+    :param retry_timeouts: Run a timed out clang-format process once more.
+    :return: The options.
+    """
+    return argparse.Namespace(
+        clang_format_executable=clang_format_executable,
+        in_place=False,
+        style=None,
+        dry_run=False,
+        timeout=timeout,
+        retry_timeouts=retry_timeouts,
+    )
+
+
+def check_format(args: argparse.Namespace, file: os.PathLike) -> CheckResult:
+    """
+    Checks the format of a file.
+
+    :param args: The options built by `clang_format_args`.
+    :param file: The file to check.
+    :return: The result, the output is the diff.
+    """
+    try:
+        outs, errs = run_clang_format_diff(args, file)
+    except TimeoutDiffError as e:
+        return CheckResult(TOOL_CLANG_FORMAT, file, process.TIMEOUT_RETURN_CODE, errors=f"{e}\n", timed_out=True)
+    except DiffError as e:
+        return CheckResult(TOOL_CLANG_FORMAT, file, 2, errors="".join([f"{e}\n", *e.errs]))
+    return CheckResult(TOOL_CLANG_FORMAT, file, 1 if outs else 0, "".join(outs), "".join(errs))
+
+
+def check_tidy(
+    clang_tidy_executable: str,
+    build_path: os.PathLike,
+    file: os.PathLike,
+    timeout: float | None,
+    retries: int = 0,
+) -> CheckResult:
+    """
+    Analyzes a translation unit of the compilation database with clang-tidy.
+
+    :param clang_tidy_executable: Path to the clang-tidy executable.
+    :param build_path: Path to the folder containing the compilation database.
+    :param file: The translation unit.
+    :param timeout: Time budget in seconds, no limit if None.
+    :param retries: Number of times clang-tidy is run again when it times out.
+    :return: The result.
+    """
+    cmd = [clang_tidy_executable, "-p", build_path, "--quiet", file]
+    logging.debug("invoking: %s", subprocess.list2cmdline(cmd))
+    try:
+        r = process.run(cmd, timeout=timeout, retries=retries, capture_output=True, text=True)
+    except subprocess.TimeoutExpired:
+        message = f"{TOOL_CLANG_TIDY} {file} timed out after {timeout} seconds\n"
+        return CheckResult(TOOL_CLANG_TIDY, file, process.TIMEOUT_RETURN_CODE, errors=message, timed_out=True)
+    except OSError as e:
+        # i.e. clang-tidy not found, reported like the clang-format invocation errors
+        return CheckResult(TOOL_CLANG_TIDY, file, 2, errors=f"{e}\n")
+    return CheckResult(TOOL_CLANG_TIDY, file, r.returncode, r.stdout, r.stderr)
+
+
+def check_pclint(pclint: RunPCLint, pclint_args: list[str]) -> CheckResult:
+    """
+    Lints the translation units of the compilation database with PCLint.
+
+    :param pclint: The PCLint project, possibly restricted to some sources.
+    :param pclint_args: The PCLint arguments, i.e. the main configuration file.
+    :return: The result.
+    """
+    r = pclint.lint(pclint_args, capture_output=True)
+    timed_out = r.returncode == process.TIMEOUT_RETURN_CODE
+    return CheckResult(TOOL_PCLINT, pclint.build_path, r.returncode, r.stdout, r.stderr, timed_out=timed_out)
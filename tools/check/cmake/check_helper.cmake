@@ -0,0 +1,375 @@
+include_guard()
+
+# Types of the targets with sources to check
+set(EMBS_CHECK_TARGET_TYPES
+    STATIC_LIBRARY
+    SHARED_LIBRARY
+    MODULE_LIBRARY
+    OBJECT_LIBRARY
+    INTERFACE_LIBRARY
+    EXECUTABLE
+)
+
+# Extensions of the translation units analyzed by clang-tidy
+set(EMBS_CHECK_TU_EXTENSIONS
+    .c
+    .cc
+    .cpp
+    .cxx
+)
+
+# Extensions of the files checked by clang-format
+set(EMBS_CHECK_FORMAT_EXTENSIONS
+    ${EMBS_CHECK_TU_EXTENSIONS}
+    .h
+    .hh
+    .hpp
+    .hxx
+)
+
+# Get the headers of a target: its header file sets and the files in its include directories under
+# EMBS_CHECK_SOURCE_DIR, i.e. the facade frontend headers or an `api` folder added with target_include_directories
+function(_embs_get_target_headers headers target)
+    get_target_property(target_source_dir ${target} SOURCE_DIR)
+    set(target_headers)
+
+    get_target_property(header_sets ${target} HEADER_SETS)
+    get_target_property(interface_header_sets ${target} INTERFACE_HEADER_SETS)
+    foreach(header_set ${header_sets} ${interface_header_sets})
+        if(header_set STREQUAL "HEADERS")
+            get_target_property(header_set_files ${target} HEADER_SET)
+        else()
+            get_target_property(header_set_files ${target} HEADER_SET_${header_set})
+        endif()
+        if(header_set_files)
+            list(APPEND target_headers ${header_set_files})
+        endif()
+    endforeach()
+
+    set(header_globs)
+    foreach(extension ${EMBS_CHECK_FORMAT_EXTENSIONS})
+        if(NOT extension IN_LIST EMBS_CHECK_TU_EXTENSIONS)
+            list(APPEND header_globs "*${extension}")
+        endif()
+    endforeach()
+
+    get_target_property(include_directories ${target} INCLUDE_DIRECTORIES)
+    get_target_property(interface_include_directories ${target} INTERFACE_INCLUDE_DIRECTORIES)
+    foreach(include_directory ${include_directories} ${interface_include_directories})
+        # skip generator expressions and folders outside of the project code
+        if(NOT include_directory OR include_directory MATCHES "^\\$<")
+            continue()
+        endif()
+        cmake_path(ABSOLUTE_PATH include_directory BASE_DIRECTORY ${target_source_dir} NORMALIZE)
+        cmake_path(IS_PREFIX EMBS_CHECK_SOURCE_DIR ${include_directory} NORMALIZE is_project_directory)
+        if(NOT is_project_directory OR NOT IS_DIRECTORY ${include_directory})
+            continue()
+        endif()
+
+        list(TRANSFORM header_globs PREPEND "${include_directory}/" OUTPUT_VARIABLE include_directory_globs)
+        file(GLOB_RECURSE include_directory_headers CONFIGURE_DEPENDS ${include_directory_globs})
+        list(APPEND target_headers ${include_directory_headers})
+    endforeach()
+
+    set(${headers} ${target_headers} PARENT_SCOPE)
+endfunction()
+
+# Get the files to check of a target: its sources and headers, as normalized absolute paths.
+# The list is empty when the target is not checked: only the targets defined under EMBS_CHECK_SOURCE_DIR are checked.
+function(_embs_get_target_check_files files target)
+    set(${files} PARENT_SCOPE)
+
+    get_target_property(target_type ${target} TYPE)
+    if(NOT target_type IN_LIST EMBS_CHECK_TARGET_TYPES)
+        return()
+    endif()
+
+    # only the project code is checked, not the external dependencies
+    get_target_property(target_source_dir ${target} SOURCE_DIR)
+    cmake_path(IS_PREFIX EMBS_CHECK_SOURCE_DIR ${target_source_dir} NORMALIZE is_project_target)
+    if(NOT is_project_target)
+        return()
+    endif()
+
+    get_target_property(target_sources ${target} SOURCES)
+    if(NOT target_sources)
+        set(target_sources)
+    endif()
+    _embs_get_target_headers(target_headers ${target})
+
+    set(target_files)
+    foreach(source ${target_sources} ${target_headers})
+        # skip generator expressions
+        if(source MATCHES "^\\$<")
+            continue()
+        endif()
+        cmake_path(ABSOLUTE_PATH source BASE_DIRECTORY ${target_source_dir} NORMALIZE)
+        list(APPEND target_files ${source})
+    endforeach()
+    list(REMOVE_DUPLICATES target_files)
+
+    set(${files} ${target_files} PARENT_SCOPE)
+endfunction()
+
+# Assign each file to check to a single target, so that a file seen by several targets (i.e. a header of an
+# include directory) is checked once: the owner is the target defined in the closest folder containing the file,
+# or else the first target seeing it. A target also checks the files it owns without seeing them.
+function(_embs_assign_check_files targets)
+    set(checked_targets)
+    set(files)
+    foreach(target ${targets})
+        _embs_get_target_check_files(target_files ${target})
+        if(target_files)
+            list(APPEND checked_targets ${target})
+        endif()
+        foreach(file ${target_files})
+            get_property(owner GLOBAL PROPERTY EMBS_CHECK_OWNER_${file})
+            if(NOT owner)
+                set_property(GLOBAL PROPERTY EMBS_CHECK_OWNER_${file} ${target})
+                list(APPEND files ${file})
+            endif()
+        endforeach()
+    endforeach()
+
+    foreach(file ${files})
+        get_property(owner GLOBAL PROPERTY EMBS_CHECK_OWNER_${file})
+        get_target_property(owner_source_dir ${owner} SOURCE_DIR)
+        cmake_path(IS_PREFIX owner_source_dir ${file} NORMALIZE is_in_owner_dir)
+        set(owner_source_dir_length -1)
+        if(is_in_owner_dir)
+            string(LENGTH "${owner_source_dir}" owner_source_dir_length)
+        endif()
+        foreach(target ${checked_targets})
+            get_target_property(target_source_dir ${target} SOURCE_DIR)
+            cmake_path(IS_PREFIX target_source_dir ${file} NORMALIZE is_in_target_dir)
+            string(LENGTH "${target_source_dir}" target_source_dir_length)
+            if(is_in_target_dir AND target_source_dir_length GREATER owner_source_dir_length)
+                set(owner ${target})
+                set(owner_source_dir_length ${target_source_dir_length})
+            endif()
+        endforeach()
+        set_property(GLOBAL PROPERTY EMBS_CHECK_OWNER_${file} ${owner})
+        set_property(GLOBAL APPEND PROPERTY EMBS_CHECK_OWNED_FILES_${owner} ${file})
+    endforeach()
+endfunction()
+
+# Add the custom commands checking the sources of a target
+# - <target>_format_check: checks the format of the sources and headers
+# - <target>_tidy: runs clang-tidy on the translation units, again only when a source or one of its headers changes
+# - <target>_pclint: runs PCLint on the translation units of the target, if EMBS_CHECK_PCLINT_PATH is defined
+# The stamp files are created in the current binary directory, so the function should be invoked from the top
+# CMakeLists.txt, after all the targets have been defined.
+# Only the targets defined under EMBS_CHECK_SOURCE_DIR are checked.
+# The format and clang-tidy checks of a file are added once, to the target owning it (see _embs_assign_check_files)
+# or else to the first target it is added to.
+# EMBS_CHECK_TIMEOUT, if defined, is the time budget (in seconds) of each check.
+function(embs_add_check_targets target)
+    if(NOT EMBS_CHECK_TU_EXECUTABLE)
+        return()
+    endif()
+
+    _embs_get_target_check_files(target_sources ${target})
+
+    set(check_options)
+    if(EMBS_CHECK_TIMEOUT)
+        list(APPEND check_options --timeout ${EMBS_CHECK_TIMEOUT})
+    endif()
+
+    set(stamp_dir "${CMAKE_CURRENT_BINARY_DIR}/embs_checks/${target}")
+    set(format_stamps)
+    set(tidy_stamps)
+
+    # PCLint lints all the translation units of the target, to check the calls between them
+    set(translation_units)
+    foreach(source ${target_sources})
+        cmake_path(GET source EXTENSION LAST_ONLY extension)
+        if(extension IN_LIST EMBS_CHECK_TU_EXTENSIONS)
+            list(APPEND translation_units ${source})
+        endif()
+    endforeach()
+
+    # the files owned without being seen, i.e. a configuration header added to the include directories of a library
+    get_property(owned_files GLOBAL PROPERTY EMBS_CHECK_OWNED_FILES_${target})
+    list(APPEND target_sources ${owned_files})
+    list(REMOVE_DUPLICATES target_sources)
+    foreach(source ${target_sources})
+        cmake_path(GET source EXTENSION LAST_ONLY extension)
+        get_property(owner GLOBAL PROPERTY EMBS_CHECK_OWNER_${source})
+        if(NOT owner)
+            set(owner ${target})
+            set_property(GLOBAL PROPERTY EMBS_CHECK_OWNER_${source} ${owner})
+        endif()
+        if(NOT owner STREQUAL target)
+            continue()
+        endif()
+
+        cmake_path(RELATIVE_PATH source BASE_DIRECTORY ${CMAKE_SOURCE_DIR} OUTPUT_VARIABLE stamp_name)
+        string(MAKE_C_IDENTIFIER "${stamp_name}" stamp_name)
+
+        if(extension IN_LIST EMBS_CHECK_FORMAT_EXTENSIONS)
+            set(stamp "${stamp_dir}/${stamp_name}.format.stamp")
+            add_custom_command(
+                OUTPUT
+                    ${stamp}
+                COMMAND
+                    ${EMBS_CHECK_TU_EXECUTABLE}
+                    --build-path ${CMAKE_BINARY_DIR}
+                    --tool clang-format
+                    --stamp ${stamp}
+                    ${check_options}
+                    ${source}
+                DEPENDS
+                    ${source}
+                    ${EMBS_CHECK_CLANG_FORMAT_CONFIG}
+                COMMENT "Checking format of ${stamp_name}"
+                VERBATIM
+            )
+            list(APPEND format_stamps ${stamp})
+        endif()
+
+        if(extension IN_LIST EMBS_CHECK_TU_EXTENSIONS)
+            set(stamp "${stamp_dir}/${stamp_name}.tidy.stamp")
+            add_custom_command(
+                OUTPUT
+                    ${stamp}
+                COMMAND
+                    ${EMBS_CHECK_TU_EXECUTABLE}
+                    --build-path ${CMAKE_BINARY_DIR}
+                    --tool clang-tidy
+                    --stamp ${stamp}
+                    --depfile ${stamp}.d
+                    ${check_options}
+                    ${source}
+                DEPENDS
+                    ${source}
+                    ${EMBS_CHECK_CLANG_TIDY_CONFIG}
+                DEPFILE ${stamp}.d
+                COMMENT "Analyzing ${stamp_name}"
+                VERBATIM
+            )
+            list(APPEND tidy_stamps ${stamp})
+        endif()
+    endforeach()
+
+    if(translation_units AND EMBS_CHECK_PCLINT_PATH)
+        set(stamp "${stamp_dir}/pclint.stamp")
+        add_custom_command(
+            OUTPUT
+                ${stamp}
+            COMMAND
+                ${EMBS_CHECK_TU_EXECUTABLE}
+                --build-path ${CMAKE_BINARY_DIR}
+                --tool pclint
+                --stamp ${stamp}
+                --depfile ${stamp}.d
+                --pclint-path ${EMBS_CHECK_PCLINT_PATH}
+                --pclint-config ${EMBS_CHECK_PCLINT_CONFIG}
+                ${check_options}
+                ${translation_units}
+            DEPENDS
+                ${translation_units}
+                ${EMBS_CHECK_PCLINT_CONFIG}
+            DEPFILE ${stamp}.d
+            COMMENT "Linting ${target}"
+            VERBATIM
+        )
+        add_custom_target(${target}_pclint DEPENDS ${stamp})
+        if(TARGET pclint)
+            add_dependencies(pclint ${target}_pclint)
+        endif()
+    endif()
+
+    if(format_stamps)
+        add_custom_target(${target}_format_check DEPENDS ${format_stamps})
+        if(TARGET format_check)
+            add_dependencies(format_check ${target}_format_check)
+        endif()
+    endif()
+    if(tidy_stamps)
+        add_custom_target(${target}_tidy DEPENDS ${tidy_stamps})
+        if(TARGET tidy)
+            add_dependencies(tidy ${target}_tidy)
+        endif()
+    endif()
+endfunction()
+
+function(_embs_get_buildsystem_targets targets directory)
+    get_property(directory_targets DIRECTORY ${directory} PROPERTY BUILDSYSTEM_TARGETS)
+    get_property(subdirectories DIRECTORY ${directory} PROPERTY SUBDIRECTORIES)
+
+    foreach(subdirectory ${subdirectories})
+        _embs_get_buildsystem_targets(subdirectory_targets ${subdirectory})
+        list(APPEND directory_targets ${subdirectory_targets})
+    endforeach()
+
+    set(${targets} ${directory_targets} PARENT_SCOPE)
+endfunction()
+
+# Add the `format_check`, `tidy`, `pclint` and `lint` targets checking all the targets defined in the project
+# `ninja lint` checks again only the files changed since the last run.
+# The `pclint` target is available when pclp64 is found (or EMBS_CHECK_PCLINT_PATH is defined),
+# EMBS_CHECK_PCLINT_CONFIG is the PCLint main configuration file (default: tools/pclint/config/std.lnt).
+function(embs_add_all_check_targets)
+    set(options ALL)
+    cmake_parse_arguments(
+        args
+        "${options}"
+        ""
+        ""
+        ${ARGN}
+    )
+
+    find_program(EMBS_CHECK_TU_EXECUTABLE embstract-check-tu)
+    if(NOT EMBS_CHECK_TU_EXECUTABLE)
+        message(WARNING "embstract-check-tu not found, check targets are not available (see docs/dev/tools.md)")
+        return()
+    endif()
+
+    if(NOT CMAKE_EXPORT_COMPILE_COMMANDS)
+        message(WARNING "CMAKE_EXPORT_COMPILE_COMMANDS is required by the check targets")
+        return()
+    endif()
+
+    if(NOT EMBS_CHECK_SOURCE_DIR)
+        set(EMBS_CHECK_SOURCE_DIR "${CMAKE_SOURCE_DIR}/code")
+    endif()
+
+    # a change of the tool configurations checks all the files again
+    if(EXISTS "${EMBS_CHECK_SOURCE_DIR}/.clang-format")
+        set(EMBS_CHECK_CLANG_FORMAT_CONFIG "${EMBS_CHECK_SOURCE_DIR}/.clang-format")
+    endif()
+    if(EXISTS "${EMBS_CHECK_SOURCE_DIR}/.clang-tidy")
+        set(EMBS_CHECK_CLANG_TIDY_CONFIG "${EMBS_CHECK_SOURCE_DIR}/.clang-tidy")
+    endif()
+
+    if(NOT EMBS_CHECK_PCLINT_PATH)
+        find_program(EMBS_CHECK_PCLINT_EXECUTABLE pclp64)
+        if(EMBS_CHECK_PCLINT_EXECUTABLE)
+            cmake_path(GET EMBS_CHECK_PCLINT_EXECUTABLE PARENT_PATH EMBS_CHECK_PCLINT_PATH)
+        else()
+            message(STATUS "pclp64 not found, PCLint is not part of the lint target")
+        endif()
+    endif()
+    if(NOT EMBS_CHECK_PCLINT_CONFIG)
+        set(EMBS_CHECK_PCLINT_CONFIG "${CMAKE_CURRENT_FUNCTION_LIST_DIR}/../../pclint/config/std.lnt")
+        cmake_path(NORMAL_PATH EMBS_CHECK_PCLINT_CONFIG)
+    endif()
+
+    if(args_ALL)
+        set(all ALL)
+    endif()
+    add_custom_target(format_check ${all})
+    add_custom_target(tidy ${all})
+    add_custom_target(lint ${all})
+    add_dependencies(lint format_check tidy)
+    if(EMBS_CHECK_PCLINT_PATH)
+        add_custom_target(pclint ${all})
+        add_dependencies(lint pclint)
+    endif()
+
+    _embs_get_buildsystem_targets(targets ${CMAKE_SOURCE_DIR})
+    _embs_assign_check_files("${targets}")
+    foreach(target ${targets})
+        embs_add_check_targets(${target})
+    endforeach()
+endfunction()
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+"""
+Run all the code checks of the project at once.
+
+This script will:
+1) Resolve the files to check once, from the given paths and the compilation database `compile_commands.json`.
+2) Run `clang-format`, `clang-tidy` and PCLint on them concurrently, sharing a single job limit.
+3) Stream the reports of all the tools as soon as they are available and return a single exit code.
+
+The jobs of PCLint, the longest single task, are reserved first, the other checks share the remaining jobs.
+"""
+
+import json
+import logging
+import os
+import shlex
+import shutil
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from threading import Condition, Event
+
+import click
+
+from check.checks import (
+    PCLINT_DEFAULT_CONFIG_FILE_PATH,
+    TOOL_CLANG_FORMAT,
+    TOOL_CLANG_TIDY,
+    TOOL_PCLINT,
+    TOOLS,
+    CheckResult,
+    check_format,
+    check_pclint,
+    check_tidy,
+    clang_format_args,
+)
+from clang_format.run_clang_format import (
+    DEFAULT_CLANG_FORMAT_IGNORE,
+    DEFAULT_EXTENSIONS,
+    excludes_from_file,
+    list_files,
+)
+from common import process
+from common.shard import COMPILE_COMMANDS_FILE_NAME
+from pclint.run_pclint import (
+    PCLINT_CONFIG_SCRIPT_RELATIVE_PATH,
+    PCLINT_LINTER_EXECUTABLE,
+    PCLINT_OUTPUT_PATH,
+    RunPCLint,
+)
+
+# CONSTANTS
+
+# Interval (in seconds) between the kills of the running processes, when stopping the checks
+STOP_POLL_INTERVAL = 0.1
+
+# Compiler options adding a project include directory, the system ones are not checked
+COMPILER_INCLUDE_OPTIONS = ["-I", "-iquote"]
+
+
+class JobLimit:
+    """
+    Limits the number of jobs running at the same time across all the tools.
+    A task can take more than one job, i.e. a multi-threaded linter.
+    """
+
+    def __init__(self, jobs: int):
+        self.jobs = jobs
+        self.available = jobs
+        self._condition = Condition()
+
+    def acquire(self, count: int) -> None:
+        with self._condition:
+            self._condition.wait_for(lambda: self.available >= count)
+            self.available -= count
+
+    def release(self, count: int) -> None:
+        with self._condition:
+            self.available += count
+            self._condition.notify_all()
+
+
+@dataclass
+class FileSet:
+    """
+    The files to check, resolved once for all the tools.
+    """
+
+    format_files: list[str]
+    compile_db_files: list[str]
+
+
+@dataclass
+class ToolSummary:
+    checked: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    duration: float = 0.0
+
+
+def compile_command_directories(compile_command_data: list[dict], build_path: os.PathLike) -> list[str]:
+    """
+    Finds the project folders of a compilation database: the folders of the sources and the include folders.
+
+    :param compile_command_data: The compilation database entries.
+    :param build_path: Path to the build folder, the generated files are not part of the project.
+    :return: The folders.
+    """
+    directories: dict[str, None] = {}
+    for item in compile_command_data:
+        directories[os.path.dirname(os.path.normpath(os.path.join(item["directory"], item["file"])))] = None
+
+        if "arguments" in item:
+            arguments = item["arguments"]
+        else:
+            arguments = shlex.split(item["command"])
+        for argument, next_argument in zip(arguments, [*arguments[1:], None]):
+            for option in COMPILER_INCLUDE_OPTIONS:
+                if argument == option and next_argument is not None:
+                    directories[os.path.normpath(os.path.join(item["directory"], next_argument))] = None
+                elif argument.startswith(option) and argument != option:
+                    directories[os.path.normpath(os.path.join(item["directory"], argument[len(option) :]))] = None
+
+    build_path = os.path.join(os.path.normpath(build_path), "")
+    return [
+        directory
+        for directory in directories
+        if os.path.isdir(directory) and not os.path.join(directory, "").startswith(build_path)
+    ]
+
+
+def resolve_file_set(paths: list[str], build_path: os.PathLike, extensions: list[str]) -> FileSet:
+    """
+    Resolves the files to check.
+
+    :param paths: Files and folders to check.
+    If empty, the folders of the compilation database sources and their include folders are formatted,
+    all the compilation database sources are linted.
+    :param build_path: Path to the folder containing the compilation database.
+    :param extensions: Extensions of the files to format.
+    :return: The files to format and the compilation database files to lint.
+    """
+    with open(os.path.join(build_path, COMPILE_COMMANDS_FILE_NAME), "r") as compile_command_file:
+        compile_command_data = json.load(compile_command_file)
+
+    compile_db_files = list(
+        dict.fromkeys(os.path.normpath(os.path.join(item["directory"], item["file"])) for item in compile_command_data)
+    )
+
+    excludes = excludes_from_file(DEFAULT_CLANG_FORMAT_IGNORE)
+    format_paths = paths or compile_command_directories(compile_command_data, build_path)
+    format_files = list(
+        dict.fromkeys(
+            os.path.abspath(file)
+            for file in list_files(format_paths, recursive=True, extensions=extensions, exclude=excludes)
+        )
+    )
+
+    if not paths:
+        return FileSet(format_files=format_files, compile_db_files=compile_db_files)
+
+    roots = [os.path.abspath(path) for path in paths]
+    compile_db_files = [
+        file
+        for file in compile_db_files
+        if any(file == root or file.startswith(os.path.join(root, "")) for root in roots)
+    ]
+    return FileSet(format_files=format_files, compile_db_files=compile_db_files)
+
+
+class RunCheck:
+    def __init__(
+        self,
+        build_path: os.PathLike,
+        jobs: int,
+        clang_format_executable: str,
+        clang_tidy_executable: str,
+        pclint: RunPCLint | None,
+        pclint_args: list[str],
+        pclint_jobs: int,
+        timeout: float | None = None,
+        retry_timeouts: bool = False,
+    ):
+        self.build_path = build_path
+        self.job_limit = JobLimit(jobs)
+        self.timeout = timeout
+        self.retries = 1 if retry_timeouts else 0
+        self.clang_format_args = clang_format_args(clang_format_executable, timeout, retry_timeouts)
+        self.clang_tidy_executable = clang_tidy_executable
+        self.pclint = pclint
+        self.pclint_args = pclint_args
+        self.pclint_jobs = min(pclint_jobs, jobs)
+        self.stopped = Event()
+
+    def _run_limited(self, jobs: int, tool: str, target: str, function, start: float | None = None) -> CheckResult:
+        """
+        Runs a check once enough jobs are available.
+
+        :param jobs: The number of jobs taken by the check.
+        :param tool: The tool.
+        :param target: The checked file or build path.
+        :param function: Runs the check.
+        :param start: When set, the jobs were reserved at this time, when the check was submitted.
+        :return: The result, its duration includes the wait for the jobs of a reserved check.
+        """
+        if start is None:
+            self.job_limit.acquire(jobs)
+            start = time.perf_counter()
+        try:
+            if self.stopped.is_set():
+                # stopped while waiting for a job
+                return CheckResult(tool, target, 1, errors=f"{tool} {target} not run, the checks were stopped\n")
+            result = function()
+        finally:
+            self.job_limit.release(jobs)
+        result.duration = time.perf_counter() - start
+        logging.debug("%s %s took %.3f s", tool, target, result.duration)
+        return result
+
+    def check_pclint(self) -> CheckResult:
+        return check_pclint(self.pclint, [*self.pclint_args, f"-max_threads={self.pclint_jobs}"])
+
+    def submit(self, executor: ThreadPoolExecutor, tools: list[str], file_set: FileSet) -> list[Future]:
+        """
+        Schedules the checks.
+
+        The jobs of PCLint are reserved before any other check is queued: waiting for several free jobs at once,
+        it would otherwise only start once the single job checks are almost done.
+        """
+        futures = []
+        if TOOL_PCLINT in tools and file_set.compile_db_files:
+            self.job_limit.acquire(self.pclint_jobs)
+            future = executor.submit(
+                self._run_limited,
+                self.pclint_jobs,
+                TOOL_PCLINT,
+                self.build_path,
+                self.check_pclint,
+                time.perf_counter(),
+            )
+            # the reserved jobs are released by the check, unless it is cancelled before running
+            future.add_done_callback(lambda f: f.cancelled() and self.job_limit.release(self.pclint_jobs))
+            futures.append(future)
+        if TOOL_CLANG_FORMAT in tools:
+            for file in file_set.format_files:
+                futures.append(
+                    executor.submit(
+                        self._run_limited,
+                        1,
+                        TOOL_CLANG_FORMAT,
+                        file,
+                        lambda f=file: check_format(self.clang_format_args, f),
+                    )
+                )
+        if TOOL_CLANG_TIDY in tools:
+            for file in file_set.compile_db_files:
+                futures.append(
+                    executor.submit(
+                        self._run_limited,
+                        1,
+                        TOOL_CLANG_TIDY,
+                        file,
+                        lambda f=file: check_tidy(
+                            self.clang_tidy_executable, self.build_path, f, self.timeout, self.retries
+                        ),
+                    )
+                )
+        return futures
+
+    def stop(self, futures: set[Future]) -> None:
+        """
+        Stops the checks: the ones waiting for a job are not run, the running ones are killed.
+        The processes are killed until all the checks are done, a check may start its process while stopping.
+
+        :param futures: The checks not completed.
+        """
+        self.stopped.set()
+        not_done = futures
+        while not_done:
+            process.kill_running_processes()
+            _, not_done = wait(not_done, timeout=STOP_POLL_INTERVAL)
+
+    def check(self, tools: list[str], file_set: FileSet, fail_fast: bool, total_timeout: float | None = None) -> int:
+        summaries = {tool: ToolSummary() for tool in tools}
+        start = time.perf_counter()
+        deadline = None if total_timeout is None else start + total_timeout
+        budget_exceeded = False
+        interrupted = False
+
+        executor = ThreadPoolExecutor(max_workers=self.job_limit.jobs)
+        pending: set[Future] = set()
+        try:
+            pending = set(self.submit(executor, tools, file_set))
+            stop = False
+            while pending and not stop:
+                remaining = None if deadline is None else max(0, deadline - time.perf_counter())
+                done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+                if not done:
+                    budget_exceeded = True
+                    break
+                for future in done:
+                    result: CheckResult = future.result()
+                    summary = summaries[result.tool]
+                    summary.checked += 1
+                    summary.duration += result.duration
+                    if result.output:
+                        click.echo(result.output, nl=False)
+                    if result.errors:
+                        click.echo(result.errors, err=True, nl=False)
+                    if result.timed_out:
+                        summary.timed_out += 1
+                    if result.returncode != 0:
+                        summary.failed += 1
+                        stop = stop or fail_fast
+        except KeyboardInterrupt:
+            # the checks run in their own process group, they do not receive the terminal interrupt
+            interrupted = True
+            raise
+        finally:
+            # on failure with fail fast, the checks not yet started are dropped
+            for future in pending:
+                future.cancel()
+            self.stopped.set()
+            if budget_exceeded or interrupted:
+                self.stop(pending)
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        click.echo(f"\n{'tool':<16}{'checked':>10}{'failed':>10}{'timed out':>10}{'time [s]':>12}", err=True)
+        for tool, summary in summaries.items():
+            click.echo(
+                f"{tool:<16}{summary.checked:>10}{summary.failed:>10}{summary.timed_out:>10}{summary.duration:>12.3f}",
+                err=True,
+            )
+        click.echo(f"wall time: {time.perf_counter() - start:.3f} s", err=True)
+
+        if budget_exceeded:
+            click.echo(
+                f"total time budget of {total_timeout} seconds exceeded, {len(pending)} check(s) not completed",
+                err=True,
+            )
+            return 1
+        return 1 if any(summary.failed for summary in summaries.values()) else 0
+
+
+@click.command()
+@click.option(
+    "--log-level",
+    "-l",
+    type=click.Choice(["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], case_sensitive=False),
+    default="INFO",
+    help="Set the logging level",
+)
+@click.option(
+    "--build-path",
+    required=True,
+    type=click.Path(exists=True, file_okay=False, dir_okay=True, resolve_path=True),
+    help="Path to a folder containg a compile command database",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=os.cpu_count(),
+    help="Number of jobs shared between all the tools",
+)
+@click.option(
+    "--tool",
+    "tools",
+    multiple=True,
+    type=click.Choice(TOOLS),
+    default=TOOLS,
+    help="Tool to run, can be repeated (default: all)",
+)
+@click.option(
+    "--fail-fast",
+    is_flag=True,
+    help="Stop scheduling new checks after the first failure",
+)
+@click.option(
+    "--extensions",
+    default=DEFAULT_EXTENSIONS,
+    help="Comma separated list of file extensions to format",
+)
+@click.option(
+    "--clang-format-executable",
+    default="clang-format",
+    help="Path to the clang-format executable",
+)
+@click.option(
+    "--clang-tidy-executable",
+    default="clang-tidy",
+    help="Path to the clang-tidy executable",
+)
+@click.option(
+    "--pclint-path",
+    type=click.Path(file_okay=False, dir_okay=True, resolve_path=True),
+    default=os.path.dirname(shutil.which(PCLINT_LINTER_EXECUTABLE) or ""),
+    help="Path to PCLint binary directory.",
+)
+@click.option(
+    "--pclint-config",
+    type=click.Path(exists=True, dir_okay=False, resolve_path=True),
+    default=PCLINT_DEFAULT_CONFIG_FILE_PATH,
+    help="PCLint main configuration file",
+)
+@click.option(
+    "--pclint-jobs",
+    type=click.IntRange(min=1),
+    help="Number of jobs used by PCLint (default: half of --jobs)",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Kill a clang-format or clang-tidy check running longer than the given time (in seconds) "
+    "and report it as timed out",
+)
+@click.option(
+    "--pclint-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Kill PCLint, linting the whole project, when running longer than the given time (in seconds)",
+)
+@click.option(
+    "--total-timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Stop all the checks after the given time (in seconds)",
+)
+@click.option(
+    "--retry-timeouts",
+    is_flag=True,
+    help="Run a timed out check once more before reporting it",
+)
+@click.argument("paths", nargs=-1, type=click.Path(exists=True))
+@click.pass_context
+def cli(
+    ctx: click.Context,
+    log_level: str,
+    build_path: os.PathLike,
+    jobs: int,
+    tools: tuple[str],
+    fail_fast: bool,
+    extensions: str,
+    clang_format_executable: str,
+    clang_tidy_executable: str,
+    pclint_path: os.PathLike,
+    pclint_config: os.PathLike,
+    pclint_jobs: int | None,
+    timeout: float | None,
+    pclint_timeout: float | None,
+    total_timeout: float | None,
+    retry_timeouts: bool,
+    paths: tuple[str],
+):
+    """
+    Check the given files and folders (default: the sources of the compilation database and their headers)
+    with clang-format, clang-tidy and PCLint.
+    """
+    # setup logging
+    logging.basicConfig(level=getattr(logging, log_level))
+
+    pclint = None
+    if TOOL_PCLINT in tools:
+        # Find path for PCLint config script
+        pcpl_config_path = os.path.abspath(os.path.join(pclint_path, PCLINT_CONFIG_SCRIPT_RELATIVE_PATH))
+        if not os.path.isfile(pcpl_config_path):
+            raise click.UsageError(f"Could not find pcpl_config.py in '{pclint_path}', use --pclint-path")
+
+        # Create PCLint confguration output folder
+        pclint_output_path = os.path.join(build_path, PCLINT_OUTPUT_PATH)
+        if not os.path.exists(pclint_output_path):
+            os.mkdir(pclint_output_path)
+
+        pclint = RunPCLint(
+            pclint_output_path,
+            pcpl_config_path,
+            build_path,
+            pclint_path,
+            timeout=pclint_timeout,
+            retry_timeouts=retry_timeouts,
+        )
+
+    file_set = resolve_file_set(list(paths), build_path, extensions.split(","))
+
+    run_check = RunCheck(
+        build_path,
+        jobs,
+        clang_format_executable,
+        clang_tidy_executable,
+        pclint,
+        [pclint_config],
+        pclint_jobs or max(1, jobs // 2),
+        timeout,
+        retry_timeouts,
+    )
+    ctx.exit(run_check.check(list(dict.fromkeys(tools)), file_set, fail_fast, total_timeout))
+
+
+if __name__ == "__main__":
+    cli()
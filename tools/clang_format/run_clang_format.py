@@ -11,12 +11,17 @@
 It runs over multiple files and directories in parallel.
 A diff output is produced and a sensible exit code is returned.
 
+In watch mode, files are checked again every time they change.
+
+The content to check can also be taken from the git index (staged files)
+or from the standard input (editor buffers), without touching the
+working tree.
+
 """
 
 from __future__ import print_function, unicode_literals
 
 import argparse
-import codecs
 import difflib
 import fnmatch
 import io
@@ -26,10 +31,19 @@
 import signal
 import subprocess
 import sys
+import threading
+import time
 import traceback
 
 from functools import partial
 
+from click import ClickException
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from common import process
+from common.shard import ShardResult, load_shard_costs, parse_shard, select_shard, shard_key
+
 try:
     from subprocess import DEVNULL  # py3k
 except ImportError:
@@ -38,6 +52,7 @@
 
 DEFAULT_EXTENSIONS = "c,h,C,H,cpp,hpp,cc,hh,c++,h++,cxx,hxx"
 DEFAULT_CLANG_FORMAT_IGNORE = ".clang-format-ignore"
+CLANG_FORMAT_STYLE_FILES = [".clang-format", "_clang-format"]
 
 
 class ExitStatus:
@@ -91,6 +106,20 @@ def list_files(files, recursive=False, extensions=None, exclude=None):
     return out
 
 
+def is_excluded(path, root, exclude):
+    """Check a path and its parent directories, up to root,
+    against the exclude patterns, like list_files() does."""
+    root = os.path.normpath(root)
+    while path and os.path.normpath(path) != root:
+        if any(fnmatch.fnmatch(path, pattern) for pattern in exclude):
+            return True
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return False
+
+
 def make_diff(file, original, reformatted):
     return list(
         difflib.unified_diff(
@@ -109,6 +138,10 @@ def __init__(self, message, errs=None):
         self.errs = errs or []
 
 
+class TimeoutDiffError(DiffError):
+    pass
+
+
 class UnexpectedError(Exception):
     def __init__(self, message, exc=None):
         super(UnexpectedError, self).__init__(message)
@@ -116,9 +149,71 @@ def __init__(self, message, exc=None):
         self.exc = exc
 
 
-def run_clang_format_diff_wrapper(args, file):
+class GitBatchReader(object):
+    """Read the content of many git objects,
+    i.e. ":./path" for the staged version of a file,
+    through a single `git cat-file --batch` process."""
+
+    def __init__(self, git_executable="git"):
+        invocation = [git_executable, "cat-file", "--batch"]
+        try:
+            self.proc = subprocess.Popen(invocation, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except OSError as exc:
+            raise DiffError("Command '{}' failed to start: {}".format(subprocess.list2cmdline(invocation), exc))
+
+    def read(self, name):
+        self.proc.stdin.write(name.encode("utf-8") + b"\n")
+        self.proc.stdin.flush()
+        header = self.proc.stdout.readline().decode("utf-8")
+        if not header:
+            raise DiffError("{}: git cat-file exited unexpectedly".format(name))
+        if header.endswith(" missing\n") or header.endswith(" ambiguous\n"):
+            raise DiffError("{}: {}".format(name, header.rsplit(" ", 1)[1].rstrip()))
+        size = int(header.split()[2])
+        data = self.proc.stdout.read(size)
+        # the content is followed by a newline
+        self.proc.stdout.read(1)
+        try:
+            return data.decode("utf-8")
+        except UnicodeDecodeError as exc:
+            raise DiffError("{}: {}".format(name, exc))
+
+    def close(self):
+        self.proc.stdin.close()
+        self.proc.stdout.close()
+        self.proc.wait()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.close()
+
+
+def list_staged_files(files, extensions, exclude, git_executable="git"):
+    """List the added, copied, modified or renamed files of the index,
+    relative to the working directory, under the given paths."""
+    invocation = [git_executable, "diff", "--cached", "--name-only", "--relative", "--diff-filter=ACMR", "-z"]
+    invocation.append("--")
+    invocation.extend(files)
     try:
-        ret = run_clang_format_diff(args, file)
+        output = subprocess.check_output(invocation)
+    except (OSError, subprocess.CalledProcessError) as exc:
+        raise DiffError(str(exc))
+
+    out = []
+    for file in output.decode("utf-8").split("\0"):
+        if not file:
+            continue
+        ext = os.path.splitext(file)[1][1:]
+        if ext in extensions and not is_excluded(file, os.curdir, exclude):
+            out.append(file)
+    return out
+
+
+def run_clang_format_diff_wrapper(args, file, content=None):
+    try:
+        ret = run_clang_format_diff(args, file, content)
         return ret
     except DiffError:
         raise
@@ -126,14 +221,40 @@ def run_clang_format_diff_wrapper(args, file):
         raise UnexpectedError("{}: {}: {}".format(file, e.__class__.__name__, e), e)
 
 
-def run_clang_format_diff(args, file):
-    try:
-        with io.open(file, "r", encoding="utf-8") as f:
-            original = f.readlines()
-    except IOError as exc:
-        raise DiffError(str(exc))
+def run_clang_format_content_diff_wrapper(args, file_and_content):
+    file, content = file_and_content
+    return run_clang_format_diff_wrapper(args, file, content)
+
+
+def file_shard_key(file):
+    """Name of a file in the shard results, relative to the working directory,
+    so that the nodes checked out in different workspaces compute the same partition."""
+    return shard_key(os.path.abspath(file), os.getcwd())
+
+
+def run_clang_format_timed_wrapper(wrapper, args, item):
+    """Also return the checked file and the time it took, recorded in the shard result."""
+    file = item[0] if isinstance(item, tuple) else item
+    start = time.monotonic()
+    outs, errs = wrapper(args, item)
+    return file, outs, errs, time.monotonic() - start
 
-    if args.in_place:
+
+def run_clang_format_diff(args, file, content=None):
+    """When content is given it is checked instead of the file,
+    the file name is only used to find the style and in the diff."""
+    if content is None:
+        try:
+            with io.open(file, "r", encoding="utf-8") as f:
+                original = f.readlines()
+        except IOError as exc:
+            raise DiffError(str(exc))
+    else:
+        original = content.splitlines(True)
+
+    if content is not None:
+        invocation = [args.clang_format_executable, "--assume-filename", file]
+    elif args.in_place:
         invocation = [args.clang_format_executable, "-i", file]
     else:
         invocation = [args.clang_format_executable, file]
@@ -168,23 +289,25 @@ def run_clang_format_diff(args, file):
         encoding_py3["encoding"] = "utf-8"
 
     try:
-        proc = subprocess.Popen(
-            invocation, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, **encoding_py3
+        proc = process.run(
+            invocation,
+            timeout=args.timeout,
+            retries=1 if args.retry_timeouts else 0,
+            input=content,
+            capture_output=True,
+            universal_newlines=True,
+            **encoding_py3
         )
     except OSError as exc:
         raise DiffError("Command '{}' failed to start: {}".format(subprocess.list2cmdline(invocation), exc))
-    proc_stdout = proc.stdout
-    proc_stderr = proc.stderr
-    if sys.version_info[0] < 3:
-        # make the pipes compatible with Python 3,
-        # reading lines should output unicode
-        encoding = "utf-8"
-        proc_stdout = codecs.getreader(encoding)(proc_stdout)
-        proc_stderr = codecs.getreader(encoding)(proc_stderr)
-    # hopefully the stderr pipe won't get full and block the process
-    outs = list(proc_stdout.readlines())
-    errs = list(proc_stderr.readlines())
-    proc.wait()
+    except subprocess.TimeoutExpired:
+        raise TimeoutDiffError(
+            "Command '{}' timed out after {:g} seconds".format(
+                subprocess.list2cmdline(invocation), round(args.timeout, 3)
+            )
+        )
+    outs = proc.stdout.splitlines(True)
+    errs = proc.stderr.splitlines(True)
     if proc.returncode:
         raise DiffError(
             "Command '{}' returned non-zero exit status {}".format(
@@ -192,7 +315,7 @@ def run_clang_format_diff(args, file):
             ),
             errs,
         )
-    if args.in_place:
+    if args.in_place and content is None:
         return [], errs
     return make_diff(file, original, outs), errs
 
@@ -243,6 +366,288 @@ def print_trouble(prog, message, use_colors):
     print("{}: {} {}".format(prog, error_text, message), file=sys.stderr)
 
 
+def interrupt(signum, frame):
+    """Kill the running clang-format processes, started in their own process group
+    they do not receive the terminal ^C, then exit with the default SIGINT handling."""
+    process.kill_running_processes()
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    os.kill(os.getpid(), signal.SIGINT)
+
+
+def init_worker():
+    """Kill the running clang-format processes when the pool is terminated."""
+
+    def terminate(signum, frame):
+        process.kill_running_processes()
+        os._exit(ExitStatus.TROUBLE)
+
+    signal.signal(signal.SIGTERM, terminate)
+
+
+def budget_args(args, deadline):
+    """Return the options of the next file checked without a pool,
+    its clang-format process is killed at the deadline of the total time budget."""
+    if deadline is None:
+        return args
+    remaining = max(0, deadline - time.monotonic())
+    if args.timeout is not None and args.timeout <= remaining:
+        return args
+    # a process killed by the total time budget is not retried
+    return argparse.Namespace(**dict(vars(args), timeout=remaining, retry_timeouts=False))
+
+
+def check_files(
+    prog,
+    args,
+    files,
+    pool,
+    colored_stdout,
+    colored_stderr,
+    stop_on_unexpected_error=True,
+    contents=None,
+    shard_result=None,
+):
+    """Run clang-format over the files and print the results,
+    return the exit status.
+
+    When contents is given, it is checked instead of the files on disk.
+    When shard_result is given, the diffs, the errors and the time taken by each file are also recorded in it.
+    """
+    retcode = ExitStatus.SUCCESS
+    if contents is None:
+        items = files
+        wrapper = run_clang_format_diff_wrapper
+    else:
+        items = zip(files, contents)
+        wrapper = run_clang_format_content_diff_wrapper
+    wrapper = partial(run_clang_format_timed_wrapper, wrapper)
+    deadline = None
+    if args.total_timeout is not None:
+        deadline = time.monotonic() + args.total_timeout
+    if pool is None:
+        it = (wrapper(budget_args(args, deadline), item) for item in items)
+    else:
+        it = pool.imap_unordered(partial(wrapper, args), items)
+    checked = 0
+    while True:
+        try:
+            if deadline is None:
+                file, outs, errs, duration = next(it)
+            elif pool is None:
+                if time.monotonic() > deadline:
+                    raise multiprocessing.TimeoutError()
+                file, outs, errs, duration = next(it)
+            else:
+                file, outs, errs, duration = it.next(timeout=max(0, deadline - time.monotonic()))
+        except StopIteration:
+            break
+        except multiprocessing.TimeoutError:
+            message = "total time budget of {} seconds exceeded, {} file(s) not checked".format(
+                args.total_timeout, len(files) - checked
+            )
+            print_trouble(prog, message, use_colors=colored_stderr)
+            if shard_result is not None:
+                shard_result.errors.append("{}: error: {}\n".format(prog, message))
+            retcode = ExitStatus.TROUBLE
+            if pool:
+                # the workers kill their running clang-format processes
+                pool.terminate()
+            break
+        except DiffError as e:
+            checked += 1
+            print_trouble(prog, str(e), use_colors=colored_stderr)
+            retcode = ExitStatus.TROUBLE
+            sys.stderr.writelines(e.errs)
+            if shard_result is not None:
+                shard_result.errors.append("{}: error: {}\n{}".format(prog, e, "".join(e.errs)))
+        except UnexpectedError as e:
+            checked += 1
+            print_trouble(prog, str(e), use_colors=colored_stderr)
+            sys.stderr.write(e.formatted_traceback)
+            retcode = ExitStatus.TROUBLE
+            if shard_result is not None:
+                shard_result.errors.append("{}: error: {}\n{}".format(prog, e, e.formatted_traceback))
+            if not stop_on_unexpected_error:
+                continue
+            # stop at the first unexpected error,
+            # something could be very wrong,
+            # don't process all files unnecessarily
+            if pool:
+                pool.terminate()
+            break
+        else:
+            checked += 1
+            sys.stderr.writelines(errs)
+            if shard_result is not None:
+                shard_result.add_item(file_shard_key(file), duration)
+                if errs:
+                    shard_result.errors.append("".join(errs))
+                if outs:
+                    shard_result.output.append("".join(outs))
+            if outs == []:
+                continue
+            if not args.quiet:
+                print_diff(outs, use_color=colored_stdout)
+            if retcode == ExitStatus.SUCCESS:
+                retcode = ExitStatus.DIFF
+    return retcode
+
+
+def check_staged_files(prog, args, excludes, colored_stdout, colored_stderr):
+    """Run clang-format over the staged content of the files
+    and print the results, return the exit status."""
+    retcode = ExitStatus.SUCCESS
+    try:
+        files = list_staged_files(args.files, args.extensions.split(","), excludes, args.git_executable)
+        if not files:
+            return retcode
+
+        staged_files = []
+        contents = []
+        with GitBatchReader(args.git_executable) as reader:
+            for file in files:
+                try:
+                    contents.append(reader.read(":./" + file.replace(os.sep, "/")))
+                except DiffError as e:
+                    print_trouble(prog, str(e), use_colors=colored_stderr)
+                    retcode = ExitStatus.TROUBLE
+                else:
+                    staged_files.append(file)
+    except DiffError as e:
+        print_trouble(prog, str(e), use_colors=colored_stderr)
+        return ExitStatus.TROUBLE
+
+    njobs = args.j
+    if njobs == 0:
+        njobs = multiprocessing.cpu_count() + 1
+    njobs = min(len(staged_files), njobs)
+
+    pool = multiprocessing.Pool(njobs, initializer=init_worker) if njobs > 1 else None
+    retcode = max(
+        retcode,
+        check_files(prog, args, staged_files, pool, colored_stdout, colored_stderr, contents=contents),
+    )
+    if pool:
+        pool.close()
+        pool.join()
+    return retcode
+
+
+class ChangedFilesEventHandler(FileSystemEventHandler):
+    """Collect the paths of the files created, modified or moved
+    under a watched directory.
+
+    The changed paths are mapped to the directory given on the command
+    line they belong to, or to None for the other watched directories.
+    """
+
+    def __init__(self, root, changed, lock, event):
+        super(ChangedFilesEventHandler, self).__init__()
+        self.root = root
+        self.changed = changed
+        self.lock = lock
+        self.event = event
+
+    def _add(self, path):
+        with self.lock:
+            if self.root is not None:
+                self.changed[path] = self.root
+            else:
+                self.changed.setdefault(path, None)
+        self.event.set()
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._add(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._add(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._add(event.dest_path)
+
+
+def watch(prog, args, excludes, pool, colored_stdout, colored_stderr):
+    """Check the files again every time they change, until interrupted.
+
+    Only the changed files matching the extension and exclude filters
+    are checked. A change of the ignore file reloads the exclude patterns
+    and a change of a style file checks all the files again.
+    """
+    extensions = args.extensions.split(",")
+    directories = [f for f in args.files if os.path.isdir(f)]
+    explicit_files = set(os.path.normpath(f) for f in args.files if not os.path.isdir(f))
+    changed = {}
+    lock = threading.Lock()
+    event = threading.Event()
+
+    observer = Observer()
+    for directory in directories:
+        observer.schedule(
+            ChangedFilesEventHandler(directory, changed, lock, event),
+            directory,
+            recursive=args.recursive,
+        )
+    # parents of the explicit files and working directory (ignore and style files)
+    others = set(os.path.dirname(f) or os.curdir for f in explicit_files)
+    others.add(os.curdir)
+    for directory in others:
+        observer.schedule(ChangedFilesEventHandler(None, changed, lock, event), directory)
+    observer.start()
+
+    print("Watching for file changes...", file=sys.stderr)
+    try:
+        while True:
+            event.wait()
+            # let the editors finish writing before checking
+            time.sleep(args.watch_delay)
+            with lock:
+                event.clear()
+                paths = dict(changed)
+                changed.clear()
+
+            names = set(os.path.basename(path) for path in paths)
+            reload_excludes = DEFAULT_CLANG_FORMAT_IGNORE in names
+            if reload_excludes:
+                excludes = excludes_from_file(DEFAULT_CLANG_FORMAT_IGNORE)
+                excludes.extend(args.exclude)
+
+            if reload_excludes or names.intersection(CLANG_FORMAT_STYLE_FILES):
+                files = list_files(
+                    args.files,
+                    recursive=args.recursive,
+                    exclude=excludes,
+                    extensions=extensions,
+                )
+            else:
+                files = []
+                for path, root in sorted(paths.items()):
+                    if not os.path.isfile(path):
+                        continue
+                    if os.path.normpath(path) in explicit_files:
+                        files.append(path)
+                    elif root is not None:
+                        ext = os.path.splitext(path)[1][1:]
+                        if ext in extensions and not is_excluded(path, root, excludes):
+                            files.append(path)
+
+            if files:
+                check_files(
+                    prog,
+                    args,
+                    files,
+                    pool,
+                    colored_stdout,
+                    colored_stderr,
+                    stop_on_unexpected_error=False,
+                )
+    finally:
+        observer.stop()
+        observer.join()
+
+
 def main():
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument(
@@ -269,7 +674,7 @@ def main():
         action="store_true",
         help="format file instead of printing differences",
     )
-    parser.add_argument("files", metavar="file", nargs="+")
+    parser.add_argument("files", metavar="file", nargs="*")
     parser.add_argument(
         "-q",
         "--quiet",
@@ -301,12 +706,101 @@ def main():
         "--style",
         help="formatting style to apply (LLVM, Google, Chromium, Mozilla, WebKit)",
     )
+    parser.add_argument(
+        "-w",
+        "--watch",
+        action="store_true",
+        help="check the files again every time they change",
+    )
+    parser.add_argument(
+        "--watch-delay",
+        metavar="SECONDS",
+        type=float,
+        default=0.2,
+        help="time to wait after a change before checking the files" " (default: 0.2)",
+    )
+    parser.add_argument(
+        "--staged",
+        action="store_true",
+        help="check the staged content of the files instead of the working tree,"
+        " all the staged files if no file is given",
+    )
+    parser.add_argument(
+        "--stdin",
+        action="store_true",
+        help="check the content read from the standard input," " requires --assume-filename",
+    )
+    parser.add_argument(
+        "--assume-filename",
+        metavar="FILE",
+        help="file name used to find the style and in the diff of --stdin",
+    )
+    parser.add_argument(
+        "--timeout",
+        metavar="SECONDS",
+        type=float,
+        help="kill a clang-format process running longer than SECONDS" " and report the file as timed out",
+    )
+    parser.add_argument(
+        "--total-timeout",
+        metavar="SECONDS",
+        type=float,
+        help="stop checking the files after SECONDS",
+    )
+    parser.add_argument(
+        "--retry-timeouts",
+        action="store_true",
+        help="check a timed out file once more before reporting it",
+    )
+    parser.add_argument(
+        "--shard",
+        metavar="INDEX/COUNT",
+        help="check only the part INDEX (from 1 to COUNT) of the files," " to split the check between COUNT nodes",
+    )
+    parser.add_argument(
+        "--shard-costs",
+        metavar="FILE",
+        help="merged shard result of a previous run," " to balance the shards by the time taken by each file",
+    )
+    parser.add_argument(
+        "--shard-result",
+        metavar="FILE",
+        help="write the machine readable result of the shard," " see `embstract-shard merge`",
+    )
+    parser.add_argument(
+        "--git-executable",
+        metavar="EXECUTABLE",
+        help="path to the git executable",
+        default="git",
+    )
 
     args = parser.parse_args()
 
+    if args.stdin and not args.assume_filename:
+        parser.error("--stdin requires --assume-filename")
+    if (args.stdin or args.staged) and (args.in_place or args.watch):
+        parser.error("--stdin and --staged cannot be used with --in-place or --watch")
+    if args.watch and args.total_timeout is not None:
+        parser.error("--total-timeout cannot be used with --watch")
+    if args.stdin and args.staged:
+        parser.error("--stdin and --staged are mutually exclusive")
+    if not args.files and not (args.stdin or args.staged):
+        parser.error("at least one file is required")
+    if (args.shard_costs or args.shard_result) and not args.shard:
+        parser.error("--shard-costs and --shard-result require --shard")
+    if args.shard and (args.stdin or args.staged or args.watch):
+        parser.error("--shard cannot be used with --stdin, --staged or --watch")
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
     # use default signal handling, like diff return SIGINT value on ^C
     # https://bugs.python.org/issue14229#msg156446
-    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    # the handler is inherited by the pool workers
+    signal.signal(signal.SIGINT, interrupt)
     try:
         signal.SIGPIPE
     except AttributeError:
@@ -338,11 +832,23 @@ def main():
         )
         return ExitStatus.TROUBLE
 
-    retcode = ExitStatus.SUCCESS
-
     excludes = excludes_from_file(DEFAULT_CLANG_FORMAT_IGNORE)
     excludes.extend(args.exclude)
 
+    if args.stdin:
+        return check_files(
+            parser.prog,
+            args,
+            [args.assume_filename],
+            None,
+            colored_stdout,
+            colored_stderr,
+            contents=[sys.stdin.read()],
+        )
+
+    if args.staged:
+        return check_staged_files(parser.prog, args, excludes, colored_stdout, colored_stderr)
+
     files = list_files(
         args.files,
         recursive=args.recursive,
@@ -350,51 +856,56 @@ def main():
         extensions=args.extensions.split(","),
     )
 
-    if not files:
+    shard_result = None
+    if shard:
+        shard_index, shard_count = shard
+        try:
+            costs = load_shard_costs(args.shard_costs, "clang-format")
+        except ClickException as e:
+            parser.error(e.format_message())
+        files = select_shard(files, shard_index, shard_count, key=file_shard_key, costs=costs)
+        if args.shard_result:
+            shard_result = ShardResult(tool="clang-format", shards=[shard_index], count=shard_count)
+
+    if not files and not args.watch:
+        if shard_result is not None:
+            shard_result.write(args.shard_result)
         return
 
     njobs = args.j
     if njobs == 0:
         njobs = multiprocessing.cpu_count() + 1
-    njobs = min(len(files), njobs)
+    if not args.watch:
+        njobs = min(len(files), njobs)
 
     if njobs == 1:
         # execute directly instead of in a pool,
         # less overhead, simpler stacktraces
-        it = (run_clang_format_diff_wrapper(args, file) for file in files)
         pool = None
     else:
-        pool = multiprocessing.Pool(njobs)
-        it = pool.imap_unordered(partial(run_clang_format_diff_wrapper, args), files)
-        pool.close()
-    while True:
-        try:
-            outs, errs = next(it)
-        except StopIteration:
-            break
-        except DiffError as e:
-            print_trouble(parser.prog, str(e), use_colors=colored_stderr)
-            retcode = ExitStatus.TROUBLE
-            sys.stderr.writelines(e.errs)
-        except UnexpectedError as e:
-            print_trouble(parser.prog, str(e), use_colors=colored_stderr)
-            sys.stderr.write(e.formatted_traceback)
-            retcode = ExitStatus.TROUBLE
-            # stop at the first unexpected error,
-            # something could be very wrong,
-            # don't process all files unnecessarily
-            if pool:
-                pool.terminate()
-            break
-        else:
-            sys.stderr.writelines(errs)
-            if outs == []:
-                continue
-            if not args.quiet:
-                print_diff(outs, use_color=colored_stdout)
-            if retcode == ExitStatus.SUCCESS:
-                retcode = ExitStatus.DIFF
+        pool = multiprocessing.Pool(njobs, initializer=init_worker)
+
+    retcode = check_files(
+        parser.prog,
+        args,
+        files,
+        pool,
+        colored_stdout,
+        colored_stderr,
+        stop_on_unexpected_error=not args.watch,
+        shard_result=shard_result,
+    )
+
+    if shard_result is not None:
+        shard_result.returncode = retcode
+        shard_result.write(args.shard_result)
+
+    if args.watch:
+        # the pool is kept warm for the incremental checks
+        watch(parser.prog, args, excludes, pool, colored_stdout, colored_stderr)
+
     if pool:
+        pool.close()
         pool.join()
     return retcode
 
@@ -3,28 +3,124 @@
 
 This exist moslty because on windows it is a pain
 to run script from files in the path.
+
+The `--total-timeout SECONDS` option kills run-clang-tidy,
+with all the clang-tidy processes it started, when it runs longer than SECONDS.
+
+The `--shard INDEX/COUNT` option analyzes only a part of the compilation database
+of the `-p` build path, see `embstract-shard merge`.
+
+All the other arguments are forwarded to run-clang-tidy.
 """
+
+import argparse
+import json
 import shutil
 import sys
 import subprocess
 import os
+import tempfile
+import time
+
+from click import ClickException
+
+from common import process
+from common.shard import COMPILE_COMMANDS_FILE_NAME, ShardResult, load_shard_costs, parse_shard, select_shard, shard_key
+
+
+def write_shard_compile_commands(build_path, shard_path, shard, costs):
+    """Write the compilation database of the translation units of the shard,
+    return the names of the translation units."""
+    with open(os.path.join(build_path, COMPILE_COMMANDS_FILE_NAME), "r") as compile_command_file:
+        compile_command_data = json.load(compile_command_file)
+
+    def key(item):
+        return shard_key(os.path.join(item["directory"], item["file"]), build_path)
+
+    shard_index, shard_count = shard
+    compile_command_data = select_shard(compile_command_data, shard_index, shard_count, key=key, costs=costs)
+    with open(os.path.join(shard_path, COMPILE_COMMANDS_FILE_NAME), "w") as compile_command_file:
+        json.dump(compile_command_data, compile_command_file, indent=4)
+    return [key(item) for item in compile_command_data]
 
 
 def main():
+    parser = argparse.ArgumentParser(add_help=False, allow_abbrev=False)
+    parser.add_argument("--total-timeout", type=float)
+    parser.add_argument("--shard")
+    parser.add_argument("--shard-costs")
+    parser.add_argument("--shard-result")
+    parser.add_argument("-p", dest="build_path")
+    args, run_clang_tidy_args = parser.parse_known_args()
+
+    shard = None
+    if args.shard:
+        if not args.build_path:
+            parser.error("--shard requires -p")
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+    elif args.shard_costs or args.shard_result:
+        parser.error("--shard-costs and --shard-result require --shard")
+
     # find the path to run-clang-tidy removing the current venv from the path list
     current_venv_path = os.environ.get("VIRTUAL_ENV")
-    env_path = ";".join(
-        [
-            path
-            for path in os.environ["PATH"].split(";")
-            if current_venv_path not in path
-        ]
-    )
+    env_path = ";".join([path for path in os.environ["PATH"].split(";") if current_venv_path not in path])
     file_path = shutil.which("run-clang-tidy", path=env_path)
 
-    # run it
-    subprocess.run([sys.executable, file_path, *sys.argv[1:]])
+    if shard is None:
+        if args.build_path:
+            run_clang_tidy_args = ["-p", args.build_path, *run_clang_tidy_args]
+        return run(file_path, run_clang_tidy_args, args.total_timeout).returncode
+
+    try:
+        costs = load_shard_costs(args.shard_costs, "clang-tidy")
+    except ClickException as e:
+        parser.error(e.format_message())
+
+    # run it on a compilation database with the translation units of the shard only
+    with tempfile.TemporaryDirectory() as shard_path:
+        translation_units = write_shard_compile_commands(os.path.abspath(args.build_path), shard_path, shard, costs)
+        start = time.monotonic()
+        r = run(
+            file_path,
+            ["-p", shard_path, *run_clang_tidy_args],
+            args.total_timeout,
+            capture_output=args.shard_result is not None,
+        )
+        duration = time.monotonic() - start
+
+    if args.shard_result:
+        shard_result = ShardResult(tool="clang-tidy", shards=[shard[0]], count=shard[1], returncode=r.returncode)
+        if r.stdout:
+            shard_result.output.append(r.stdout)
+        if r.stderr:
+            shard_result.errors.append(r.stderr)
+        shard_result.add_run(translation_units, duration)
+        shard_result.write(args.shard_result)
+    return r.returncode
+
+
+def run(file_path, run_clang_tidy_args, total_timeout, capture_output=False):
+    """Run run-clang-tidy, the captured output is also printed."""
+    try:
+        r = process.run(
+            [sys.executable, file_path, *run_clang_tidy_args],
+            timeout=total_timeout,
+            capture_output=capture_output,
+            text=True,
+        )
+    except subprocess.TimeoutExpired:
+        message = "run-clang-tidy timed out after {} seconds\n".format(total_timeout)
+        r = subprocess.CompletedProcess(file_path, process.TIMEOUT_RETURN_CODE, "", message)
+        if not capture_output:
+            sys.stderr.write(message)
+    if capture_output:
+        sys.stdout.write(r.stdout)
+        sys.stderr.write(r.stderr)
+    return r
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
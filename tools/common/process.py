@@ -0,0 +1,128 @@
+"""
+Subprocess helpers shared by the tools.
+
+The child processes are started in their own process group, so that a stuck child can be killed together with the
+processes it spawned (i.e. a shell or a multi-process linter).
+"""
+
+import logging
+import os
+import signal
+import subprocess
+from threading import RLock
+
+# Return code of a process killed on timeout, the same as the coreutils `timeout` command
+TIMEOUT_RETURN_CODE = 124
+
+_running_processes: set[subprocess.Popen] = set()
+# Reentrant, `kill_running_processes` can be called by a signal handler interrupting `run` in the same thread
+_running_processes_lock = RLock()
+
+
+def process_group_kwargs() -> dict:
+    """
+    :return: The `subprocess.Popen` keyword arguments starting the child in a new process group.
+    """
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def kill_process_group(proc: subprocess.Popen) -> None:
+    """
+    Kills a process started with `process_group_kwargs` and all its children.
+
+    :param proc: The process to kill.
+    """
+    if proc.poll() is not None:
+        return
+    try:
+        if os.name == "nt":
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        # the process exited in the meantime
+        pass
+    proc.kill()
+
+
+def kill_running_processes() -> None:
+    """
+    Kills all the processes started by `run` that are still running, i.e. when a total time budget is exceeded.
+    """
+    with _running_processes_lock:
+        processes = list(_running_processes)
+    for proc in processes:
+        kill_process_group(proc)
+
+
+def run(
+    cmd: list[str],
+    timeout: float | None = None,
+    input: str | bytes | None = None,
+    capture_output: bool = False,
+    retries: int = 0,
+    **kwargs,
+) -> subprocess.CompletedProcess:
+    """
+    Runs a command like `subprocess.run`, but on timeout the whole process group is killed.
+
+    :param cmd: The command to run.
+    :param timeout: Time budget in seconds, no limit if None.
+    :param input: Data sent to the standard input.
+    :param capture_output: Capture the standard output and error.
+    :param retries: Number of times the command is run again when it times out.
+    :return: The completed process.
+    :raise subprocess.TimeoutExpired: When the time budget is exceeded by the last attempt.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return _run_once(cmd, timeout, input, capture_output, **kwargs)
+        except subprocess.TimeoutExpired:
+            if attempt == retries:
+                raise
+            # a straggler may be due to a temporary overload, give it a second chance
+            logging.warning(
+                "%s timed out after %s seconds, retrying (attempt %d of %d)",
+                subprocess.list2cmdline(cmd) if isinstance(cmd, list) else cmd,
+                timeout,
+                attempt + 2,
+                retries + 1,
+            )
+
+
+def _run_once(
+    cmd: list[str],
+    timeout: float | None,
+    input: str | bytes | None,
+    capture_output: bool,
+    **kwargs,
+) -> subprocess.CompletedProcess:
+    if input is not None:
+        kwargs["stdin"] = subprocess.PIPE
+    if capture_output:
+        kwargs["stdout"] = subprocess.PIPE
+        kwargs["stderr"] = subprocess.PIPE
+
+    with subprocess.Popen(cmd, **process_group_kwargs(), **kwargs) as proc:
+        with _running_processes_lock:
+            _running_processes.add(proc)
+        try:
+            stdout, stderr = proc.communicate(input, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            kill_process_group(proc)
+            proc.communicate()
+            raise
+        except BaseException:
+            kill_process_group(proc)
+            raise
+        finally:
+            with _running_processes_lock:
+                _running_processes.discard(proc)
+
+    return subprocess.CompletedProcess(proc.args, proc.returncode, stdout, stderr)
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Deterministic partitioning of the checks between CI nodes.
+
+Each node runs a tool with `--shard INDEX/COUNT` (INDEX from 1 to COUNT) and checks only its part of the files.
+The files are assigned using their historical cost (the durations recorded in a previous merged result) when available,
+a stable hash of their name otherwise, so that every node computes the same partition.
+
+Each node writes a partial result with `--shard-result FILE`, the `merge` command combines them in a single report,
+which can also be used as historical cost for the next runs.
+"""
+
+import hashlib
+import json
+import os
+from collections.abc import Callable, Iterable
+from dataclasses import asdict, dataclass, field
+
+import click
+
+# CONSTANTS
+
+# Name of the compilation database, also used for the database of the translation units of a shard
+COMPILE_COMMANDS_FILE_NAME = "compile_commands.json"
+SHARD_RESULT_VERSION = 1
+# Return code of an incomplete merge, when some shards are missing
+SHARD_MISSING_RETURN_CODE = 2
+
+
+def parse_shard(value: str) -> tuple[int, int]:
+    """
+    Parses a shard specification.
+
+    :param value: The shard as `INDEX/COUNT`, with INDEX from 1 to COUNT.
+    :return: The shard index and count.
+    :raise ValueError: When the specification is not valid.
+    """
+    index, separator, count = value.partition("/")
+    if not separator or not index.isdigit() or not count.isdigit():
+        raise ValueError(f"Invalid shard '{value}', expected 'INDEX/COUNT'")
+    if not 1 <= int(index) <= int(count):
+        raise ValueError(f"Invalid shard '{value}', INDEX must be between 1 and COUNT")
+    return int(index), int(count)
+
+
+def shard_key(path: os.PathLike, base_path: os.PathLike | None = None) -> str:
+    """
+    Builds the name of a file, independent from the location of the workspace and the platform.
+
+    :param path: The file path.
+    :param base_path: Path the name is relative to, i.e. the build path for the compilation database entries.
+    :return: The name.
+    """
+    if base_path is not None:
+        path = os.path.relpath(path, base_path)
+    return os.path.normpath(path).replace(os.sep, "/")
+
+
+def load_shard_costs(file_path: os.PathLike | None, tool: str) -> dict[str, float]:
+    """
+    Loads the historical cost of the files from a (merged) shard result.
+
+    :param file_path: The shard result file, no cost if None or not existing (i.e. on the first run).
+    :param tool: The tool the costs are loaded for.
+    :return: The duration of each file.
+    :raise click.ClickException: When the shard result is the one of another tool.
+    """
+    if file_path is None or not os.path.isfile(file_path):
+        return {}
+    shard_result = ShardResult.read(file_path)
+    if shard_result.tool != tool:
+        raise click.ClickException(f"{file_path}: shard result of {shard_result.tool}, expected {tool}")
+    return shard_result.items
+
+
+def select_shard(
+    items: Iterable,
+    index: int,
+    count: int,
+    key: Callable[[object], str],
+    costs: dict[str, float] | None = None,
+) -> list:
+    """
+    Selects the items of a shard.
+
+    Without costs, the items are assigned by a stable hash of their key.
+    With costs, the most expensive items are assigned first, each one to the least loaded shard.
+    The items with no cost are assumed to take the average time.
+
+    :param items: All the items.
+    :param index: The shard index, from 1 to count.
+    :param count: The number of shards.
+    :param key: Returns the name of an item.
+    :param costs: The historical cost of the items.
+    :return: The items of the shard, in their original order.
+    """
+    items = list(items)
+    keys = [key(item) for item in items]
+
+    if not costs:
+        selected = {
+            item_key
+            for item_key in keys
+            if int(hashlib.sha1(item_key.encode("utf-8")).hexdigest(), 16) % count == index - 1
+        }
+    else:
+        default_cost = sum(costs.values()) / len(costs)
+        loads = [0.0] * count
+        selected = set()
+        for item_key in sorted(set(keys), key=lambda item_key: (-costs.get(item_key, default_cost), item_key)):
+            shard = min(range(count), key=lambda shard: (loads[shard], shard))
+            loads[shard] += costs.get(item_key, default_cost)
+            if shard == index - 1:
+                selected.add(item_key)
+
+    return [item for item, item_key in zip(items, keys) if item_key in selected]
+
+
+@dataclass
+class ShardResult:
+    """
+    The machine readable result of a shard.
+
+    The output is a list of records (i.e. a diff or a message), so that the records reported by more than one shard
+    are reported once when merging.
+    """
+
+    tool: str
+    shards: list[int]
+    count: int
+    returncode: int = 0
+    output: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+    items: dict[str, float] = field(default_factory=dict)
+    version: int = SHARD_RESULT_VERSION
+
+    def add_item(self, name: str, duration: float) -> None:
+        self.items[name] = self.items.get(name, 0.0) + duration
+
+    def add_run(self, names: list[str], duration: float) -> None:
+        """
+        Records a tool run checking several items.
+
+        The tools report a single duration for the run, shared evenly between the items.
+
+        :param names: The names of the items.
+        :param duration: The duration of the run.
+        """
+        for name in names:
+            self.add_item(name, duration / len(names))
+
+    def write(self, file_path: os.PathLike) -> None:
+        with open(file_path, "w") as shard_result_file:
+            json.dump(asdict(self), shard_result_file, indent=4)
+
+    @classmethod
+    def read(cls, file_path: os.PathLike) -> "ShardResult":
+        with open(file_path, "r") as shard_result_file:
+            data = json.load(shard_result_file)
+        if data.get("version") != SHARD_RESULT_VERSION:
+            raise click.ClickException(f"{file_path}: unsupported shard result version {data.get('version')}")
+        return cls(**data)
+
+    @classmethod
+    def merge(cls, results: list["ShardResult"]) -> "ShardResult":
+        """
+        Merges the results of the shards of the same tool.
+
+        :param results: The results to merge.
+        :return: The merged result.
+        """
+        tools = {result.tool for result in results}
+        counts = {result.count for result in results}
+        if len(tools) != 1 or len(counts) != 1:
+            raise click.ClickException("Only the shard results of the same tool and shard count can be merged")
+
+        merged = cls(tool=tools.pop(), shards=[], count=counts.pop())
+        output: dict[str, None] = {}
+        errors: dict[str, None] = {}
+        for result in results:
+            merged.shards.extend(result.shards)
+            merged.returncode = max(merged.returncode, result.returncode)
+            output.update(dict.fromkeys(result.output))
+            errors.update(dict.fromkeys(result.errors))
+            for name, duration in result.items.items():
+                merged.add_item(name, duration)
+        merged.shards.sort()
+        merged.output = list(output)
+        merged.errors = list(errors)
+        return merged
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command(name="merge")
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False, writable=True),
+    help="Write the merged result, i.e. to be used as historical cost by the next runs",
+)
+@click.argument("shard_results", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.pass_context
+def cli_merge(ctx: click.Context, output: os.PathLike | None, shard_results: tuple[os.PathLike]):
+    """
+    Merge the partial results of the shards in a single report and exit code.
+    """
+    merged = ShardResult.merge([ShardResult.read(file_path) for file_path in shard_results])
+    if output:
+        merged.write(output)
+
+    for record in merged.output:
+        click.echo(record, nl=False)
+    for record in merged.errors:
+        click.echo(record, err=True, nl=False)
+
+    missing = sorted(set(range(1, merged.count + 1)).difference(merged.shards))
+    if missing:
+        click.echo(f"error: missing results of the shards {missing} of {merged.count}", err=True)
+        ctx.exit(merged.returncode or SHARD_MISSING_RETURN_CODE)
+    ctx.exit(merged.returncode)
+
+
+if __name__ == "__main__":
+    cli()
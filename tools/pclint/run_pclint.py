@@ -8,17 +8,24 @@
 3) Invoke PCLint to analyze the requested files.
 
 The script can be run in one shot mode and in watch mode.
+Several build paths can be linted in one shot mode, their reports are merged in a single one.
+In one shot mode the translation units can be split between several nodes with `--shard`.
 """
 
+import importlib
 import json
 import logging
 import os
+import re
 import shutil
 import subprocess
 import time
 from collections import defaultdict
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pprint import pformat
-from threading import Event
+from threading import Event, Lock
 
 
 import click
@@ -27,9 +34,18 @@
 from watchdog.observers import Observer as WatchdogObserver
 from watchdog.observers.api import BaseObserver
 
+from common import process
+from common.shard import (
+    COMPILE_COMMANDS_FILE_NAME,
+    ShardResult,
+    load_shard_costs,
+    parse_shard,
+    select_shard,
+    shard_key,
+)
+
 # CONSTANTS
 
-BUILD_COMPILE_COMMANDS_FILE_NAME = "compile_commands.json"
 BUILD_GENERATED_COMPILER_CONFIG_JSON_FILE_NAME = "pclint_compiler_config.json"
 BUILD_GENERATED_COMPILER_CONFIG_JSON_SCHEMA_FILE_NAME = "pclint_compiler_config.schema.json"
 
@@ -39,6 +55,138 @@
 PCLINT_OUTPUT_PATH = ".pclint"
 PCLINT_PROJECT_CONFIG_FILE_NAME = "pclint_project_config.lnt"
 
+# Matches the message format set in `config/options.lnt`
+PCLINT_MESSAGE_REGEX = re.compile(
+    r"^(?:(?P<file>.*):(?P<line>\d+):(?P<column>\d+): )?(?P<type>\w+) (?P<number>\d+): (?P<message>.*)$"
+)
+PCLINT_SUPPLEMENTAL_MESSAGE_TYPE = "supplemental"
+
+# Highest exit code, the OS keeps the low 8 bits only
+MAX_RETURN_CODE = 255
+
+METRICS_PREFIX = "run_pclint"
+
+# A profiling hook receives the phase name, its start time and its duration (in seconds)
+ProfilingHook = Callable[[str, float, float], None]
+
+
+class RunPCLintMetrics:
+    """
+    Collects phase durations and event counters of a `run-pclint` execution.
+    It can be shared between threads.
+    """
+
+    def __init__(self, hooks: list[ProfilingHook] | None = None):
+        self.hooks = hooks or []
+        self.phases: dict[str, list[float]] = defaultdict(list)
+        self.counters: dict[str, int] = defaultdict(int)
+        self._lock = Lock()
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """
+        Measures the duration of the enclosed block and notifies the profiling hooks.
+
+        :param name: The phase name.
+        """
+        start = time.time()
+        start_counter = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.perf_counter() - start_counter)
+
+    def record(self, name: str, start: float, duration: float) -> None:
+        """
+        Records the duration of a phase and notifies the profiling hooks.
+
+        :param name: The phase name.
+        :param start: The phase start time (seconds since the epoch).
+        :param duration: The phase duration in seconds.
+        """
+        with self._lock:
+            self.phases[name].append(duration)
+        for hook in self.hooks:
+            hook(name, start, duration)
+
+    def increment(self, name: str, value: int = 1) -> None:
+        """
+        Increments a counter.
+
+        :param name: The counter name.
+        :param value: The increment.
+        """
+        with self._lock:
+            self.counters[name] += value
+
+    def summary(self) -> str:
+        """
+        :return: A human readable summary of the collected metrics.
+        """
+        lines = [f"{'phase':<40}{'count':>8}{'total [s]':>12}{'max [s]':>12}"]
+        for name, durations in sorted(self.phases.items()):
+            lines.append(f"{name:<40}{len(durations):>8}{sum(durations):>12.3f}{max(durations):>12.3f}")
+        lines.append("")
+        lines.append(f"{'counter':<40}{'value':>8}")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"{name:<40}{value:>8}")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> str:
+        """
+        :return: The collected metrics as a JSON document.
+        """
+        data = {
+            "phases": {
+                name: {"count": len(durations), "total": sum(durations), "max": max(durations)}
+                for name, durations in sorted(self.phases.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+        return json.dumps(data, indent=4) + "\n"
+
+    def to_openmetrics(self) -> str:
+        """
+        :return: The collected metrics in the OpenMetrics text format.
+        """
+        metric = f"{METRICS_PREFIX}_phase_duration_seconds"
+        lines = [f"# TYPE {metric} summary", f"# UNIT {metric} seconds"]
+        for name, durations in sorted(self.phases.items()):
+            lines.append(f'{metric}_sum{{phase="{name}"}} {sum(durations)}')
+            lines.append(f'{metric}_count{{phase="{name}"}} {len(durations)}')
+        for name, value in sorted(self.counters.items()):
+            metric = f"{METRICS_PREFIX}_{name}"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}_total {value}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write(self, file_path: os.PathLike, metrics_format: str) -> None:
+        """
+        Writes the collected metrics to a file, replacing it atomically so that scrapers never read a partial file.
+
+        :param file_path: Output file path.
+        :param metrics_format: Either `json` or `openmetrics`.
+        """
+        content = self.to_json() if metrics_format == "json" else self.to_openmetrics()
+        temporary_file_path = f"{file_path}.tmp"
+        with open(temporary_file_path, "w") as metrics_file:
+            metrics_file.write(content)
+        os.replace(temporary_file_path, file_path)
+
+
+def load_profiling_hook(reference: str) -> ProfilingHook:
+    """
+    Loads a profiling hook from a `module:function` reference.
+
+    :param reference: The hook reference.
+    :return: The hook.
+    """
+    module_name, _, function_name = reference.partition(":")
+    if not module_name or not function_name:
+        raise ValueError(f"Invalid profiling hook '{reference}', expected 'module:function'")
+    return getattr(importlib.import_module(module_name), function_name)
+
 
 class ProjectFilesEventHandler(PatternMatchingEventHandler):
     """
@@ -49,6 +197,7 @@ def __init__(
         self,
         *,
         event: Event,
+        metrics: RunPCLintMetrics | None = None,
         patterns: list[str] | None = None,
         ignore_patterns: list[str] | None = None,
         ignore_directories: bool = False,
@@ -61,19 +210,29 @@ def __init__(
             case_sensitive=case_sensitive,
         )
         self.event = event
+        self.metrics = metrics
 
     def on_modified(self, event):
         logging.debug("%s", event)
+        if self.metrics is not None:
+            self.metrics.increment("project_watch_events")
         self.event.set()
 
     @classmethod
-    def schedule(cls, observer: BaseObserver, event: Event, compile_command_file_path: os.PathLike) -> None:
+    def schedule(
+        cls,
+        observer: BaseObserver,
+        event: Event,
+        compile_command_file_path: os.PathLike,
+        metrics: RunPCLintMetrics | None = None,
+    ) -> None:
         """
         Schedules the event handler for the specified files in the compile command database.
 
         :param observer: The observer to which the handler should be attached.
         :param event: The event to trigger
         :param compile_command_file_path: Path to the `compile_commands.json` file.
+        :param metrics: Metrics counting the received events.
         """
         with open(compile_command_file_path, "r") as compile_command_file:
             compile_command_data = json.load(compile_command_file)
@@ -87,7 +246,7 @@ def schedule(cls, observer: BaseObserver, event: Event, compile_command_file_pat
         logging.debug("Scheduling the following files\n%s", pformat(dict(collection)))
 
         for folder_path, patterns in collection.items():
-            event_handler = cls(event=event, patterns=patterns, ignore_directories=True)
+            event_handler = cls(event=event, metrics=metrics, patterns=patterns, ignore_directories=True)
             observer.schedule(event_handler, folder_path)
 
 
@@ -101,6 +260,7 @@ def __init__(
         *,
         event: Event,
         build_path: os.PathLike,
+        metrics: RunPCLintMetrics | None = None,
         patterns: list[str] | None = None,
         ignore_patterns: list[str] | None = None,
         ignore_directories: bool = False,
@@ -115,6 +275,11 @@ def __init__(
 
         self.build_path = build_path
         self.event = event
+        self.metrics = metrics
+
+    def _count_event(self) -> None:
+        if self.metrics is not None:
+            self.metrics.increment("build_watch_events")
 
     def _check_if_ready(self) -> bool:
         """
@@ -122,7 +287,7 @@ def _check_if_ready(self) -> bool:
 
         :return: True if all required files are present, False otherwise.
         """
-        compile_command_exists = os.path.exists(os.path.join(self.build_path, BUILD_COMPILE_COMMANDS_FILE_NAME))
+        compile_command_exists = os.path.exists(os.path.join(self.build_path, COMPILE_COMMANDS_FILE_NAME))
         compiler_configuration_exists = os.path.exists(
             os.path.join(self.build_path, BUILD_GENERATED_COMPILER_CONFIG_JSON_FILE_NAME)
         )
@@ -134,27 +299,37 @@ def on_deleted(self, event: FileSystemEvent) -> None:
 
     def on_created(self, event: FileSystemEvent) -> None:
         logging.debug("%s", event)
+        self._count_event()
         if self._check_if_ready():
             self.event.set()
 
     def on_modified(self, event: FileSystemEvent) -> None:
         logging.debug("%s", event)
+        self._count_event()
         if self._check_if_ready():
             self.event.set()
 
     @classmethod
-    def schedule(cls, observer: BaseObserver, event: Event, build_path: os.PathLike) -> None:
+    def schedule(
+        cls,
+        observer: BaseObserver,
+        event: Event,
+        build_path: os.PathLike,
+        metrics: RunPCLintMetrics | None = None,
+    ) -> None:
         """
         Schedules the event handler for build-related files.
 
         :param observer: The observer to which the handler should be attached.
         :param event: The event to trigger
         :param build_path: Path to the build directory.
+        :param metrics: Metrics counting the received events.
         """
         event_handler = cls(
             event=event,
             build_path=build_path,
-            patterns=[BUILD_COMPILE_COMMANDS_FILE_NAME, BUILD_GENERATED_COMPILER_CONFIG_JSON_FILE_NAME],
+            metrics=metrics,
+            patterns=[COMPILE_COMMANDS_FILE_NAME, BUILD_GENERATED_COMPILER_CONFIG_JSON_FILE_NAME],
             ignore_directories=True,
         )
         observer.schedule(event_handler, build_path)
@@ -167,11 +342,59 @@ def __init__(
         pcpl_config_path: os.PathLike,
         build_path: os.PathLike,
         pclint_path: os.path,
+        metrics: RunPCLintMetrics | None = None,
+        timeout: float | None = None,
+        retry_timeouts: bool = False,
+        shard: tuple[int, int] | None = None,
+        shard_costs: dict[str, float] | None = None,
+        sources: list[os.PathLike] | None = None,
     ):
         self.pclint_output_path = pclint_output_path
         self.pcpl_config_path = pcpl_config_path
         self.build_path = build_path
         self.pclint_path = pclint_path
+        self.metrics = metrics if metrics is not None else RunPCLintMetrics()
+        self.timeout = timeout
+        self.retry_timeouts = retry_timeouts
+        self.shard = shard
+        self.shard_costs = shard_costs
+        self.sources = None if sources is None else {os.path.normpath(os.path.abspath(file)) for file in sources}
+        # Names of the translation units linted, see `shard_key`
+        self.translation_units: list[str] = []
+
+    def select_compile_commands(self, compile_command_file_path: os.PathLike) -> os.PathLike:
+        """
+        Writes the compilation database of the selected translation units: the given sources and/or the shard.
+
+        :param compile_command_file_path: Path to the `compile_commands.json` file of the build.
+        :return: Path to the filtered `compile_commands.json` file, in the PCLint output folder.
+        """
+        with open(compile_command_file_path, "r") as compile_command_file:
+            compile_command_data = json.load(compile_command_file)
+
+        if self.sources is not None:
+            compile_command_data = [
+                item
+                for item in compile_command_data
+                if os.path.normpath(os.path.join(item["directory"], item["file"])) in self.sources
+            ]
+
+        if self.shard is not None:
+            shard_index, shard_count = self.shard
+            compile_command_data = select_shard(
+                compile_command_data,
+                shard_index,
+                shard_count,
+                key=lambda item: shard_key(os.path.join(item["directory"], item["file"]), self.build_path),
+                costs=self.shard_costs,
+            )
+            logging.debug("Shard %d of %d: %d translation units", shard_index, shard_count, len(compile_command_data))
+
+        selected_compile_command_file_path = os.path.join(self.pclint_output_path, COMPILE_COMMANDS_FILE_NAME)
+        with open(selected_compile_command_file_path, "w") as selected_compile_command_file:
+            json.dump(compile_command_data, selected_compile_command_file, indent=4)
+
+        return selected_compile_command_file_path
 
     def extract_and_validate_compiler_configuration_from_build(self) -> dict[str, str]:
         # open schema
@@ -187,7 +410,8 @@ def extract_and_validate_compiler_configuration_from_build(self) -> dict[str, st
             compiler_configuration: dict = json.load(pclint_compiler_config_file)
 
         # validate configuration
-        JSONvalidate(compiler_configuration, compiler_configuration_schema)
+        with self.metrics.phase("validate_compiler_configuration"):
+            JSONvalidate(compiler_configuration, compiler_configuration_schema)
 
         return compiler_configuration
 
@@ -199,19 +423,20 @@ def build_pclint_compiler_configuration(
         pclint_compiler_config_cl = [f"--{key}={value}" for key, value in compiler_configuration.items() if value != ""]
         output_lint_file = os.path.join(self.pclint_output_path, PCLINT_COMPILER_CONFIG_FILE_NAME + ".lnt")
         output_header_file = os.path.join(self.pclint_output_path, PCLINT_COMPILER_CONFIG_FILE_NAME + ".h")
-        subprocess.run(
-            [
-                "python",
-                self.pcpl_config_path,
-                *pclint_compiler_config_cl,
-                "--generate-compiler-config",
-                f"--config-output-lnt-file={output_lint_file}",
-                f"--config-output-header-file={output_header_file}",
-            ],
-            shell=True,
-            check=True,
-            stderr=subprocess.DEVNULL,
-        )
+        with self.metrics.phase("generate_compiler_configuration"):
+            subprocess.run(
+                [
+                    "python",
+                    self.pcpl_config_path,
+                    *pclint_compiler_config_cl,
+                    "--generate-compiler-config",
+                    f"--config-output-lnt-file={output_lint_file}",
+                    f"--config-output-header-file={output_header_file}",
+                ],
+                shell=True,
+                check=True,
+                stderr=subprocess.DEVNULL,
+            )
 
         logging.debug("Compiler Configuration created in %s", output_lint_file)
         return output_lint_file
@@ -223,21 +448,30 @@ def build_pclint_project_configuration(
         logging.debug("Project configuration")
         compiler = compiler_configuration["compiler"]
         project_config_file_path = os.path.join(self.pclint_output_path, PCLINT_PROJECT_CONFIG_FILE_NAME)
-        compile_command_file_path = os.path.join(self.build_path, BUILD_COMPILE_COMMANDS_FILE_NAME)
-
-        subprocess.run(
-            [
-                "python",
-                self.pcpl_config_path,
-                f"--compiler={compiler}",
-                f"--compilation-db={compile_command_file_path}",
-                f"--config-output-lnt-file={project_config_file_path}",
-                "--generate-project-config",
-            ],
-            shell=True,
-            check=True,
-            stderr=subprocess.DEVNULL,
-        )
+        compile_command_file_path = os.path.join(self.build_path, COMPILE_COMMANDS_FILE_NAME)
+        if self.shard is not None or self.sources is not None:
+            compile_command_file_path = self.select_compile_commands(compile_command_file_path)
+
+        with self.metrics.phase("generate_project_configuration"):
+            subprocess.run(
+                [
+                    "python",
+                    self.pcpl_config_path,
+                    f"--compiler={compiler}",
+                    f"--compilation-db={compile_command_file_path}",
+                    f"--config-output-lnt-file={project_config_file_path}",
+                    "--generate-project-config",
+                ],
+                shell=True,
+                check=True,
+                stderr=subprocess.DEVNULL,
+            )
+
+        with open(compile_command_file_path, "r") as compile_command_file:
+            self.translation_units = [
+                shard_key(os.path.join(item["directory"], item["file"]), self.build_path)
+                for item in json.load(compile_command_file)
+            ]
 
         logging.debug("Project Configuration created in %s", project_config_file_path)
 
@@ -262,27 +496,46 @@ def prepare_pclint_execution_enviornment(self) -> dict[str, str]:
         env["PCLINT_LNT_PATH"] = pclint_lnt_path
         env["PCLINT_TOOLING_PATH"] = pclint_tooling_path
 
+        self.metrics.increment("configs_regenerated")
         return env
 
     def execute_pclint(
         self,
         args: list[str],
         env: dict[str, str],
-    ) -> int:
+        capture_output: bool = False,
+    ) -> subprocess.CompletedProcess:
         logging.debug("Running PCLint")
         pcpl64_path = os.path.abspath(os.path.join(self.pclint_path, PCLINT_LINTER_EXECUTABLE))
         cmd = [pcpl64_path, *args]
         logging.debug("invoking: \n%s", pformat(cmd))
-        r = subprocess.run(cmd, shell=True, env=env)
-        return r.returncode
+        self.metrics.increment("translation_units", len(self.translation_units))
+        self.metrics.increment("lint_runs")
+        try:
+            with self.metrics.phase("pclint"):
+                return process.run(
+                    cmd,
+                    timeout=self.timeout,
+                    retries=1 if self.retry_timeouts else 0,
+                    shell=True,
+                    env=env,
+                    capture_output=capture_output,
+                    text=True,
+                )
+        except subprocess.TimeoutExpired:
+            self.metrics.increment("lint_timeouts")
+            logging.error("PCLint on %s timed out after %s seconds", self.build_path, self.timeout)
+
+        message = f"{PCLINT_LINTER_EXECUTABLE} timed out after {self.timeout} seconds\n"
+        return subprocess.CompletedProcess(cmd, process.TIMEOUT_RETURN_CODE, "", message)
 
     def lint(
         self,
         pclint_args: list[str],
-    ) -> int:
+        capture_output: bool = False,
+    ) -> subprocess.CompletedProcess:
         env = self.prepare_pclint_execution_enviornment()
-        exec_return = self.execute_pclint(pclint_args, env)
-        return exec_return
+        return self.execute_pclint(pclint_args, env, capture_output)
 
     def watch(
         self,
@@ -294,7 +547,7 @@ def watch(
         build_files_changed_event = Event()
 
         ret_val: int = 0
-        compile_command_file_path = os.path.join(self.build_path, BUILD_COMPILE_COMMANDS_FILE_NAME)
+        compile_command_file_path = os.path.join(self.build_path, COMPILE_COMMANDS_FILE_NAME)
 
         # clear file change events
         project_files_changed_event.clear()
@@ -311,13 +564,16 @@ def watch(
 
                     env = self.prepare_pclint_execution_enviornment()
 
-                    # remove all listener
-                    watchdog_observer.unschedule_all()
+                    with self.metrics.phase("watch_reschedule"):
+                        # remove all listener
+                        watchdog_observer.unschedule_all()
 
-                    BuildFilesEventHandler.schedule(watchdog_observer, build_files_changed_event, self.build_path)
-                    ProjectFilesEventHandler.schedule(
-                        watchdog_observer, project_files_changed_event, compile_command_file_path
-                    )
+                        BuildFilesEventHandler.schedule(
+                            watchdog_observer, build_files_changed_event, self.build_path, self.metrics
+                        )
+                        ProjectFilesEventHandler.schedule(
+                            watchdog_observer, project_files_changed_event, compile_command_file_path, self.metrics
+                        )
 
                     project_files_changed_event.set()
 
@@ -340,6 +596,105 @@ def watch(
         return ret_val
 
 
+def split_pclint_messages(output: str) -> list[str]:
+    """
+    Splits the PCLint output in messages. Supplemental messages are kept together with the message they refer to.
+
+    :param output: PCLint standard output.
+    :return: The list of messages, each one possibly spanning multiple lines.
+    """
+    messages: list[str] = []
+    for line in output.splitlines(keepends=True):
+        match = PCLINT_MESSAGE_REGEX.match(line)
+        is_supplemental = match is not None and match["type"] == PCLINT_SUPPLEMENTAL_MESSAGE_TYPE
+        if messages and (match is None or is_supplemental):
+            messages[-1] += line
+        else:
+            messages.append(line)
+    return messages
+
+
+class RunPCLintGroup:
+    """
+    Runs PCLint on several build paths at the same time, merging their reports.
+    """
+
+    def __init__(
+        self,
+        contexts: list[RunPCLint],
+        jobs: int,
+        shard: tuple[int, int] | None = None,
+        shard_result_path: os.PathLike | None = None,
+    ):
+        self.contexts = contexts
+        self.jobs = jobs
+        self.shard = shard
+        self.shard_result_path = shard_result_path
+
+    def _pclint_args_with_thread_budget(self, pclint_args: list[str], concurrency: int) -> list[str]:
+        """
+        Shares the CPU budget between the concurrent PCLint executions.
+        The option is appended so that it overrides the value set in the `.lnt` files.
+        """
+        max_threads = max(1, self.jobs // concurrency)
+        return [*pclint_args, f"-max_threads={max_threads}"]
+
+    def lint(
+        self,
+        pclint_args: list[str],
+    ) -> int:
+        if len(self.contexts) == 1 and self.shard_result_path is None:
+            return self.contexts[0].lint(pclint_args).returncode
+
+        def timed_lint(context: RunPCLint) -> tuple[subprocess.CompletedProcess, float]:
+            start = time.perf_counter()
+            result = context.lint(args, capture_output=True)
+            return result, time.perf_counter() - start
+
+        concurrency = min(len(self.contexts), self.jobs)
+        args = self._pclint_args_with_thread_budget(pclint_args, concurrency)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            try:
+                results, durations = zip(*executor.map(timed_lint, self.contexts))
+            except KeyboardInterrupt:
+                # PCLint runs in its own process group, it does not receive the terminal interrupt
+                process.kill_running_processes()
+                raise
+
+        # messages from sources shared between the build paths are reported once
+        messages: dict[str, None] = {}
+        errors: list[str] = []
+        for context, result in zip(self.contexts, results):
+            logging.debug("%s returned %d", context.build_path, result.returncode)
+            if result.stderr:
+                click.echo(result.stderr, err=True, nl=False)
+                errors.append(result.stderr)
+            messages.update(dict.fromkeys(split_pclint_messages(result.stdout)))
+
+        for message in messages:
+            click.echo(message, nl=False)
+
+        ret_val = (
+            0 if all(result.returncode == 0 for result in results) else min(MAX_RETURN_CODE, max(1, len(messages)))
+        )
+
+        if self.shard_result_path is not None:
+            shard_index, shard_count = self.shard
+            shard_result = ShardResult(
+                tool="pclint",
+                shards=[shard_index],
+                count=shard_count,
+                returncode=ret_val,
+                output=list(messages),
+                errors=errors,
+            )
+            for context, duration in zip(self.contexts, durations):
+                shard_result.add_run(context.translation_units, duration)
+            shard_result.write(self.shard_result_path)
+
+        return ret_val
+
+
 @click.group()
 @click.option(
     "--log-level",
@@ -351,31 +706,140 @@ def watch(
 @click.option(
     "--pclint-path",
     type=click.Path(exists=True, file_okay=False, dir_okay=True, resolve_path=True),
-    default=os.path.dirname(shutil.which("pclp64")),
+    default=os.path.dirname(shutil.which(PCLINT_LINTER_EXECUTABLE) or ""),
     help="Path to PCLint binary directory.",
 )
 @click.option(
     "--build-path",
     required=True,
+    multiple=True,
     type=click.Path(exists=True, file_okay=False, dir_okay=True, resolve_path=True),
-    help="Path to a folder containg a compile command database",
+    help="Path to a folder containg a compile command database, can be repeated to lint several configurations",
+)
+@click.option(
+    "--jobs",
+    "-j",
+    type=click.IntRange(min=1),
+    default=os.cpu_count(),
+    help="Number of CPUs shared between all the build paths",
+)
+@click.option(
+    "--timeout",
+    type=click.FloatRange(min=0, min_open=True),
+    help="Kill a PCLint execution running longer than the given time (in seconds)",
+)
+@click.option(
+    "--retry-timeouts",
+    is_flag=True,
+    help="Run a timed out PCLint execution once more before reporting it",
+)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Print a summary of the phase durations and event counters on exit",
+)
+@click.option(
+    "--metrics-file",
+    type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+    help="Write the phase durations and event counters to a file on exit",
+)
+@click.option(
+    "--metrics-format",
+    type=click.Choice(["openmetrics", "json"], case_sensitive=False),
+    default="openmetrics",
+    help="Format of the metrics file",
+)
+@click.option(
+    "--profile-hook",
+    multiple=True,
+    help="Callable invoked at the end of each phase with its name, start time and duration, as 'module:function'",
+)
+@click.option(
+    "--shard",
+    metavar="INDEX/COUNT",
+    help="Lint only the part INDEX (from 1 to COUNT) of the translation units, to split the lint between COUNT nodes",
+)
+@click.option(
+    "--shard-costs",
+    type=click.Path(dir_okay=False, resolve_path=True),
+    help="Merged shard result of a previous run, to balance the shards by the time taken by each translation unit",
+)
+@click.option(
+    "--shard-result",
+    type=click.Path(dir_okay=False, writable=True, resolve_path=True),
+    help="Write the machine readable result of the shard, see `embstract-shard merge`",
 )
 @click.pass_context
-def cli(ctx: click.Context, log_level: str, pclint_path: os.PathLike, build_path: os.PathLike):
+def cli(
+    ctx: click.Context,
+    log_level: str,
+    pclint_path: os.PathLike,
+    build_path: tuple[os.PathLike],
+    jobs: int,
+    timeout: float | None,
+    retry_timeouts: bool,
+    profile: bool,
+    metrics_file: os.PathLike | None,
+    metrics_format: str,
+    profile_hook: tuple[str],
+    shard: str | None,
+    shard_costs: os.PathLike | None,
+    shard_result: os.PathLike | None,
+):
     # setup logging
     logging.basicConfig(level=getattr(logging, log_level))
 
+    # setup sharding
+    if shard is not None:
+        try:
+            shard = parse_shard(shard)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--shard")
+    elif shard_costs or shard_result:
+        raise click.UsageError("--shard-costs and --shard-result require --shard")
+    costs = load_shard_costs(shard_costs, "pclint")
+
+    # setup metrics
+    metrics = RunPCLintMetrics([load_profiling_hook(reference) for reference in profile_hook])
+    run_start = time.time()
+    run_start_counter = time.perf_counter()
+
+    def report_metrics():
+        metrics.record("total", run_start, time.perf_counter() - run_start_counter)
+        if profile:
+            click.echo(metrics.summary(), err=True, nl=False)
+        if metrics_file:
+            metrics.write(metrics_file, metrics_format.lower())
+
+    ctx.call_on_close(report_metrics)
+
     # Find path for PCLint config script
     pcpl_config_path = os.path.abspath(os.path.join(pclint_path, PCLINT_CONFIG_SCRIPT_RELATIVE_PATH))
     if not os.path.isfile(pcpl_config_path):
         raise FileNotFoundError(f"Could not find pcpl_config.py in {pclint_path}")
 
-    # Create PCLint confguration output folder
-    pclint_output_path = os.path.join(build_path, PCLINT_OUTPUT_PATH)
-    if not os.path.exists(pclint_output_path):
-        os.mkdir(pclint_output_path)
+    contexts = []
+    for path in dict.fromkeys(build_path):
+        # Create PCLint confguration output folder
+        pclint_output_path = os.path.join(path, PCLINT_OUTPUT_PATH)
+        if not os.path.exists(pclint_output_path):
+            os.mkdir(pclint_output_path)
+
+        contexts.append(
+            RunPCLint(
+                pclint_output_path,
+                pcpl_config_path,
+                path,
+                pclint_path,
+                metrics,
+                timeout,
+                retry_timeouts,
+                shard,
+                costs,
+            )
+        )
 
-    ctx.obj = RunPCLint(pclint_output_path, pcpl_config_path, build_path, pclint_path)
+    ctx.obj = RunPCLintGroup(contexts, jobs, shard, shard_result)
 
 
 @cli.command(name="watch")
@@ -391,9 +855,13 @@ def cli_watch(ctx: click.Context, throttle: float, pclint_args: list[str]) -> in
     """
     Watch the project files and run the linter everytime a file changes.
     """
-    if not isinstance(ctx.obj, RunPCLint):
-        raise TypeError("The conect object is not an instance of RunPCLint")
-    return ctx.obj.watch(throttle, pclint_args)
+    if not isinstance(ctx.obj, RunPCLintGroup):
+        raise TypeError("The conect object is not an instance of RunPCLintGroup")
+    if len(ctx.obj.contexts) != 1:
+        raise click.UsageError("watch supports a single --build-path")
+    if ctx.obj.shard is not None:
+        raise click.UsageError("watch does not support --shard")
+    ctx.exit(ctx.obj.contexts[0].watch(throttle, pclint_args))
 
 
 @cli.command(name="lint")
@@ -403,9 +871,9 @@ def cli_lint(ctx: click.Context, pclint_args: list[str]) -> int:
     """
     Lint the project.
     """
-    if not isinstance(ctx.obj, RunPCLint):
-        raise TypeError("The conect object is not an instance of RunPCLint")
-    return ctx.obj.lint(pclint_args)
+    if not isinstance(ctx.obj, RunPCLintGroup):
+        raise TypeError("The conect object is not an instance of RunPCLintGroup")
+    ctx.exit(ctx.obj.lint(pclint_args))
 
 
 if __name__ == "__main__":